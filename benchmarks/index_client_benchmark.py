@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pip_tracker_core
+class StandInIndexHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    def log_message(self, format, *args):
+        pass
+    def do_GET(self):
+        parts = [part for part in self.path.split("?", 1)[0].split("/") if part]
+        if len(parts) != 2 or parts[0] != "simple":
+            self.send_error(404)
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        name = pip_tracker_core.canonicalize_name(parts[1])
+        files = []
+        for major in range(1, 21):
+            filename = f"{name.replace('-', '_')}-{major}.0.tar.gz"
+            files.append({"filename": filename, "url": f"/files/{filename}", "hashes": {}})
+        body = json.dumps({"meta": {"api-version": "1.1"}, "name": name, "files": files}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.pypi.simple.v1+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", f'"{name}-20"')
+        self.end_headers()
+        self.wfile.write(body)
+def start_server(latency):
+    StandInIndexHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInIndexHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/simple/"
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return time.perf_counter() - started, result
+def sequential(index_url, names):
+    client = pip_tracker_core.SimpleIndexClient(index_url)
+    return [client.fetch(name) for name in names]
+def concurrent(index_url, names, concurrency):
+    client = pip_tracker_core.AsyncIndexClient(index_url, concurrency=concurrency)
+    return client.fetch_many((name, None, None) for name in names)
+def pip_list_outdated(index_url):
+    result = subprocess.run(
+        [sys.executable, "-m", "pip", "list", "--outdated", "--format=json",
+         "--disable-pip-version-check", "--index-url", index_url],
+        capture_output=True, text=True
+    )
+    return json.loads(result.stdout) if result.returncode == 0 else []
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение способов поиска последних версий пакетов")
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=pip_tracker_core.INDEX_CONCURRENCY)
+    parser.add_argument("--skip-pip", action="store_true")
+    args = parser.parse_args()
+    server, index_url = start_server(args.latency_ms / 1000)
+    names = [f"project-{i:04d}" for i in range(args.projects)]
+    installed = [pkg.key for pkg in pip_tracker_core.PACKAGE_INVENTORY.packages()]
+    rows = []
+    elapsed, responses = timed(lambda: sequential(index_url, names))
+    rows.append(("SimpleIndexClient, последовательно", len(names), elapsed, responses))
+    elapsed, responses = timed(lambda: concurrent(index_url, names, args.concurrency))
+    rows.append((f"AsyncIndexClient, {args.concurrency} соединений", len(names), elapsed, responses))
+    elapsed, responses = timed(lambda: concurrent(index_url, installed, args.concurrency))
+    rows.append(("AsyncIndexClient, установленные пакеты", len(installed), elapsed, responses))
+    if not args.skip_pip:
+        elapsed, outdated = timed(lambda: pip_list_outdated(index_url))
+        rows.append(("pip list --outdated, установленные пакеты", len(installed), elapsed, outdated))
+    server.shutdown()
+    print(f"{'Способ':45} {'Проектов':>9} {'Время, с':>9} {'Запросов/с':>11}")
+    for label, count, elapsed, responses in rows:
+        failed = sum(1 for response in responses if not isinstance(response, (pip_tracker_core.IndexResponse, dict)))
+        note = f"  (ошибок: {failed})" if failed else ""
+        print(f"{label:45} {count:9d} {elapsed:9.2f} {count / elapsed:11.1f}{note}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_BUDGET_MS = 600
+def child():
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import pip_tracker
+    imported = time.perf_counter()
+    from PyQt6.QtCore import QObject, QEvent
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    stages = {"import": imported - started}
+    class FirstPaint(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Type.Paint and "first_paint" not in stages:
+                stages["first_paint"] = time.perf_counter() - started
+                stages["heavy_modules"] = sorted(
+                    name for name in ("matplotlib", "asyncio") if name in sys.modules)
+                print(json.dumps(stages), flush=True)
+                os._exit(0)
+            return False
+    window_started = time.perf_counter()
+    window = pip_tracker.MainWindow()
+    stages["main_window"] = time.perf_counter() - window_started
+    paint_filter = FirstPaint()
+    window.installEventFilter(paint_filter)
+    window.show()
+    app.exec()
+def run_child(platform):
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", platform)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    wall = time.perf_counter() - started
+    lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+    if not lines:
+        raise RuntimeError(f"Окно не было отрисовано:\n{result.stderr}")
+    stages = json.loads(lines[-1])
+    stages["process"] = wall
+    return stages
+def main():
+    parser = argparse.ArgumentParser(description="Время до первой отрисовки MainWindow")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--platform", default="offscreen")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return 0
+    runs = [run_child(args.platform) for _ in range(args.runs)]
+    print(f"{'Этап':30} {'Медиана, мс':>12} {'Мин, мс':>9}")
+    for stage, label in (("import", "import pip_tracker"), ("main_window", "MainWindow()"),
+                         ("first_paint", "Первая отрисовка"), ("process", "Процесс целиком")):
+        values = [run[stage] * 1000 for run in runs]
+        print(f"{label:30} {statistics.median(values):12.0f} {min(values):9.0f}")
+    heavy = sorted(set(name for run in runs for name in run["heavy_modules"]))
+    if heavy:
+        print(f"Загружены до первой отрисовки: {', '.join(heavy)}")
+    first_paint = statistics.median(run["first_paint"] for run in runs) * 1000
+    if first_paint > args.budget_ms or "matplotlib" in heavy:
+        print(f"Превышен бюджет запуска: {first_paint:.0f} мс (бюджет {args.budget_ms:.0f} мс)")
+        return 1
+    print(f"В пределах бюджета: {first_paint:.0f} мс из {args.budget_ms:.0f} мс")
+    return 0
+if __name__ == "__main__":
+    sys.exit(main())
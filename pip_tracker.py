@@ -1,23 +1,39 @@
 import sys
 import os
-import json
-import subprocess
-import pkg_resources
-import datetime
-import matplotlib
-matplotlib.use('QtAgg')  
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+import bisect
+import threading
+from pip_tracker_core import (PACKAGE_INVENTORY, DEPENDENCY_GRAPH, BULK_UPDATE_WORKERS, SIZE_ANALYSIS_WORKERS,
+                              PIP_TIMEOUT, PIP_QUERY_TIMEOUT, HISTORY_PAGE_SIZE, canonicalize_name,
+                              diff_snapshots, package_size, run_command, install_package, uninstall_package,
+                              find_outdated, BulkUpdate, BulkUninstall, SizeAnalysis, PackageHistoryManager,
+                              CATALOG_CACHE, catalog_install_state, ENVIRONMENTS, ENVIRONMENT_WORKERS,
+                              load_drift_sources, drift_report)
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                            QTableWidget, QTableWidgetItem, QTabWidget, QPushButton, 
                            QLabel, QLineEdit, QComboBox, QMessageBox, QGroupBox, 
                            QSplitter, QProgressBar, QHeaderView, QDialog, QTextEdit,
-                           QListWidget, QListWidgetItem, QPushButton, QDateEdit)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QDate
+                           QListWidget, QListWidgetItem, QPushButton, QDateEdit, QTableView, QFileDialog)
+from PyQt6.QtCore import (Qt, QThread, QObject, QTimer, QFileSystemWatcher, pyqtSignal, QDate,
+                          QAbstractTableModel, QModelIndex, QSortFilterProxyModel)
 from PyQt6.QtGui import QIcon, QFont, QColor
 ICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "PipTracker.ico")
 APP_ICON = None
-class PackageInstaller(QThread):
+CHART_REDRAW_INTERVAL = 500
+CATALOG_SEARCH_DEBOUNCE = 150
+CATALOG_FILE = "category.JSON"
+class PipWorker(QThread):
+    timeout = PIP_TIMEOUT
+    def __init__(self):
+        super().__init__()
+        self.cancel_event = threading.Event()
+    def cancel(self):
+        self.cancel_event.set()
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+    def run_pip(self, cmd, stream=True, timeout=None):
+        on_output = self.progress.emit if stream and hasattr(self, "progress") else None
+        return run_command(cmd, on_output, self.cancel_event, timeout or self.timeout)
+class PackageInstaller(PipWorker):
     finished = pyqtSignal(bool, str)
     progress = pyqtSignal(str)
     def __init__(self, package_name, upgrade=False):
@@ -26,25 +42,11 @@ class PackageInstaller(QThread):
         self.upgrade = upgrade
     def run(self):
         try:
-            cmd = ["pip", "install"]
-            if self.upgrade:
-                cmd.append("--upgrade")
-            cmd.append(self.package_name)
             self.progress.emit(f"Установка {self.package_name}...")
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            stdout, stderr = process.communicate()
-            if process.returncode == 0:
-                self.finished.emit(True, f"Успешно установлен {self.package_name}")
-            else:
-                self.finished.emit(False, f"Ошибка: {stderr}")
+            self.finished.emit(*install_package(self.package_name, self.upgrade, self.progress.emit, self.cancel_event))
         except Exception as e:
             self.finished.emit(False, f"Ошибка: {str(e)}")
-class PackageUninstaller(QThread):
+class PackageUninstaller(PipWorker):
     finished = pyqtSignal(bool, str)
     progress = pyqtSignal(str)
     def __init__(self, package_name):
@@ -53,58 +55,88 @@ class PackageUninstaller(QThread):
     def run(self):
         try:
             self.progress.emit(f"Проверка зависимостей для {self.package_name}...")
-            deps_process = subprocess.Popen(
-                ["pip", "show", self.package_name], 
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            stdout, stderr = deps_process.communicate()
-            if deps_process.returncode != 0:
-                self.finished.emit(False, f"Пакет {self.package_name} не найден")
-                return
-            required_by = None
-            for line in stdout.split('\n'):
-                if line.startswith("Required-by:"):
-                    required_by = line[len("Required-by:"):].strip()
-                    break
-            if required_by and required_by != "":
-                self.finished.emit(False, f"Внимание! Пакет {self.package_name} требуется для: {required_by}. Удаление отменено.")
-                return
-            self.progress.emit(f"Удаление {self.package_name}...")
-            process = subprocess.Popen(
-                ["pip", "uninstall", "-y", self.package_name], 
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            stdout, stderr = process.communicate()
-            if process.returncode == 0:
-                self.finished.emit(True, f"Успешно удален {self.package_name}")
-            else:
-                self.finished.emit(False, f"Ошибка при удалении: {stderr}")
+            self.finished.emit(*uninstall_package(self.package_name, self.progress.emit, self.cancel_event))
         except Exception as e:
             self.finished.emit(False, f"Ошибка: {str(e)}")
-class OutdatedPackagesFinder(QThread):
+class OutdatedPackagesFinder(PipWorker):
+    cached = pyqtSignal(list)
     finished = pyqtSignal(list)
+    timeout = PIP_QUERY_TIMEOUT
+    def __init__(self, packages=None, index_url=None, cache=None, python_version=None, force=False, python=None):
+        super().__init__()
+        self.packages = packages
+        self.index_url = index_url
+        self.cache = cache
+        self.python_version = python_version
+        self.force = force
+        self.python = python
     def run(self):
-        try:
-            process = subprocess.Popen(
-                ["pip", "list", "--outdated", "--format=json"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            stdout, stderr = process.communicate()
-            if process.returncode == 0:
-                outdated = json.loads(stdout)
-                self.finished.emit(outdated)
-            else:
-                self.finished.emit([])
-        except Exception:
-            self.finished.emit([])
+        self.finished.emit(find_outdated(self.packages, self.index_url, self.cache, self.cached.emit, self.cancel_event,
+                                         self.python_version, self.force, self.python))
+class OutdatedService(QObject):
+    cached = pyqtSignal(list)
+    finished = pyqtSignal(list)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.finder = None
+        self.pending = False
+        self.rerun = False
+        self.outdated = None
+    def request(self, force=False):
+        if self.pending:
+            self.rerun = self.rerun or force
+            return
+        self.pending = True
+        self.rerun = False
+        self.finder = OutdatedPackagesFinder(force=force)
+        self.finder.cached.connect(self.cached)
+        self.finder.finished.connect(self.on_finished)
+        self.finder.start()
+    def on_finished(self, outdated):
+        self.pending = False
+        self.outdated = outdated
+        self.finished.emit(outdated)
+        if self.rerun:
+            self.finder.wait()
+            self.request(force=True)
+class SitePackagesWatcher(QObject):
+    packages_changed = pyqtSignal(list, list, list)
+    def __init__(self, inventory, parent=None, poll_interval=2000, debounce_interval=300):
+        super().__init__(parent)
+        self.inventory = inventory
+        self.snapshot = inventory.snapshot()
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(debounce_interval)
+        self.debounce_timer.timeout.connect(self.check)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(poll_interval)
+        self.poll_timer.timeout.connect(self.check)
+        self.fs_watcher = QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self.schedule_check)
+        self.watch_paths()
+    def watch_paths(self):
+        watched = set(self.fs_watcher.directories())
+        missing = [path for path in self.inventory.search_paths() if path not in watched]
+        failed = self.fs_watcher.addPaths(missing) if missing else []
+        if failed and not self.poll_timer.isActive():
+            self.poll_timer.start()
+    def schedule_check(self, path=None):
+        self.debounce_timer.start()
+    def reset(self):
+        self.snapshot = self.inventory.snapshot()
+    def check(self):
+        self.debounce_timer.stop()
+        snapshot = self.inventory.snapshot()
+        added, removed, changed = diff_snapshots(self.snapshot, snapshot)
+        self.snapshot = snapshot
+        self.watch_paths()
+        if added or removed or changed:
+            self.packages_changed.emit(added, removed, changed)
+        return added, removed, changed
 class CategoryLibraryView(QWidget):
     install_requested = pyqtSignal(str)
+    update_requested = pyqtSignal(str)
     def __init__(self, parent=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
@@ -114,7 +146,11 @@ class CategoryLibraryView(QWidget):
         search_layout.setSpacing(2)  
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Поиск библиотек...")
-        self.search_input.textChanged.connect(self.filter_libraries)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(CATALOG_SEARCH_DEBOUNCE)
+        self.search_timer.timeout.connect(self.filter_libraries)
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
         search_layout.addWidget(QLabel("Поиск:"))
         search_layout.addWidget(self.search_input)
         self.layout.addLayout(search_layout)
@@ -127,8 +163,8 @@ class CategoryLibraryView(QWidget):
         category_layout.addWidget(category_label)
         category_layout.addWidget(self.category_combo)
         self.layout.addLayout(category_layout)
-        self.table = QTableWidget(0, 5)
-        self.table.setHorizontalHeaderLabels(["Название", "Активность", "Простота", "Размер", "Поддержка"])
+        self.table = QTableWidget(0, 6)
+        self.table.setHorizontalHeaderLabels(["Название", "Активность", "Простота", "Размер", "Поддержка", "Состояние"])
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table.verticalHeader().setDefaultSectionSize(22)  
         self.layout.addWidget(self.table)
@@ -144,129 +180,105 @@ class CategoryLibraryView(QWidget):
         button_layout.addWidget(self.install_button)
         button_layout.addWidget(self.docs_button)
         self.layout.addLayout(button_layout)
-        self.categories_data = {}
-        self.all_libraries = []  
+        self.catalog = None
         self.current_libraries = []  
-        self.load_categories()
-    def load_categories(self):
+        self.outdated = {}
+        self.install_state = {}
+        self.catalog_watcher = QFileSystemWatcher(self)
+        self.catalog_watcher.fileChanged.connect(lambda path: self.reload_timer.start())
+        self.reload_timer = QTimer(self)
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(300)
+        self.reload_timer.timeout.connect(self.reload_categories)
         try:
-            with open('category.JSON', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.categories_data = data
-                self.category_combo.clear()
-                for category in data['categories']:
-                    self.category_combo.addItem(category['name'])
-                    for lib in category.get('libraries', []):
-                        lib_info = lib.copy()
-                        lib_info['category'] = category['name']
-                        self.all_libraries.append(lib_info)
-                if self.category_combo.count() > 0:
-                    self.load_category(0)
+            self.load_categories()
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить категории: {str(e)}")
+    def load_categories(self):
+        catalog = CATALOG_CACHE.load(CATALOG_FILE)
+        self.watch_catalog()
+        if catalog is self.catalog:
+            return
+        self.catalog = catalog
+        self.install_state = catalog_install_state(catalog, PACKAGE_INVENTORY.refresh(), self.outdated)
+        current_category = self.category_combo.currentText()
+        self.category_combo.blockSignals(True)
+        self.category_combo.clear()
+        for category in catalog.categories:
+            self.category_combo.addItem(category['name'])
+        index = max(self.category_combo.findText(current_category), 0)
+        self.category_combo.setCurrentIndex(index)
+        self.category_combo.blockSignals(False)
+        if self.search_input.text().strip():
+            self.filter_libraries()
+        else:
+            self.load_category(index)
+    def reload_categories(self):
+        try:
+            self.load_categories()
+        except Exception as e:
+            self.watch_catalog()
+            print(f"Ошибка при обновлении каталога: {e}")
+    def watch_catalog(self):
+        path = os.path.abspath(CATALOG_FILE)
+        if os.path.exists(path) and path not in self.catalog_watcher.files():
+            self.catalog_watcher.addPath(path)
     def load_category(self, index):
-        if index < 0 or index >= len(self.categories_data.get('categories', [])):
+        if self.catalog is None or index < 0 or index >= len(self.catalog.categories):
             return
-        category = self.categories_data['categories'][index]
-        libraries = category.get('libraries', [])
-        search_text = self.search_input.text().lower()
-        if search_text:
-            libraries = [lib for lib in libraries if search_text in lib.get('name', '').lower()]
+        category = self.catalog.categories[index]
+        libraries = category['libraries']
+        search_text = self.search_input.text()
+        if search_text.strip():
+            libraries = self.catalog.index.search(search_text, category['name'])
         self.current_libraries = libraries
         self.update_table(libraries)
     def update_table(self, libraries):
+        self.table.setUpdatesEnabled(False)
         self.table.setRowCount(0)
-        size_translation = {
-            "light": "легкий",
-            "small": "малый",
-            "medium": "средний",
-            "large": "большой",
-            "very-large": "очень большой",
-            "module": "модуль",
-            "built-in": "встроенный"
-        }
-        support_translation = {
-            "built-in": "встроенная",
-            "powerful": "мощная",
-            "active": "активная",
-            "stable": "стабильная",
-            "gpu": "GPU",
-            "standard": "стандартная",
-            "good": "хорошая",
-            "interactive": "интерактивная",
-            "declarative": "декларативная",
-            "popular": "популярная",
-            "modern": "современная",
-            "async": "асинхронная",
-            "micro": "микро",
-            "low-level": "низкоуровневая",
-            "basic": "базовая",
-            "fast": "быстрая",
-            "excel": "Excel",
-            "yaml": "YAML",
-            "convenient": "удобная",
-            "advanced": "продвинутая",
-            "distributed": "распределенная",
-            "specialized": "специализированная",
-            "nlp": "NLP",
-            "usb": "USB",
-            "bluetooth": "Bluetooth",
-            "raspberry-pi": "Raspberry Pi",
-            "camera": "камера",
-            "lightweight": "легковесная",
-            "orm": "ORM",
-            "nosql": "NoSQL",
-            "cache": "кэш",
-            "postgresql": "PostgreSQL",
-            "mysql": "MySQL",
-            "ml": "ML",
-            "deep-learning": "глубокое обучение",
-            "high-level": "высокоуровневая",
-            "gradient-boosting": "градиентный бустинг",
-            "2d": "2D",
-            "3d": "3D",
-            "opengl": "OpenGL",
-            "cross-platform": "кросс-платформенная",
-            "windows": "Windows",
-            "multi": "мульти"
-        }
+        self.table.setRowCount(len(libraries))
         for i, lib in enumerate(libraries):
-            self.table.insertRow(i)
-            name = lib.get('name', '')
-            name_item = QTableWidgetItem(name)
-            name_item.setFlags(name_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(i, 0, name_item)
-            activity = lib.get('activity', 0)
-            activity_text = "★" * activity
-            activity_item = QTableWidgetItem(activity_text)
-            activity_item.setFlags(activity_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(i, 1, activity_item)
-            simplicity = lib.get('simplicity', 0)
-            simplicity_text = "★" * simplicity
-            simplicity_item = QTableWidgetItem(simplicity_text)
-            simplicity_item.setFlags(simplicity_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(i, 2, simplicity_item)
-            size = lib.get('size', '')
-            size_ru = size_translation.get(size, size)
-            size_item = QTableWidgetItem(size_ru)
-            size_item.setFlags(size_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(i, 3, size_item)
-            support = lib.get('support', '')
-            support_ru = support_translation.get(support, support)
-            support_item = QTableWidgetItem(support_ru)
-            support_item.setFlags(support_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(i, 4, support_item)
+            for column, text in enumerate(lib['display']):
+                item = QTableWidgetItem(text)
+                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+                self.table.setItem(i, column, item)
+            self.set_state_item(i, lib)
+        self.table.setUpdatesEnabled(True)
         self.enable_buttons()
-    def filter_libraries(self, text):
-        search_text = text.lower()
-        if not search_text:
+    def set_state_item(self, row, lib):
+        state = self.install_state.get(lib['key'])
+        if state is None:
+            text = ""
+        elif state[1]:
+            text = f"{state[0]} → {state[1]}"
+        else:
+            text = f"установлена {state[0]}"
+        item = QTableWidgetItem(text)
+        item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+        if state is not None and state[1]:
+            item.setForeground(QColor(200, 100, 0))
+        elif state is not None:
+            item.setForeground(QColor(0, 128, 0))
+        self.table.setItem(row, 5, item)
+    def set_outdated(self, outdated_list):
+        self.outdated = {canonicalize_name(pkg.get('name', '')): pkg for pkg in outdated_list}
+        self.refresh_install_state()
+    def refresh_install_state(self, *args):
+        if self.catalog is None:
+            return
+        self.install_state = catalog_install_state(self.catalog, PACKAGE_INVENTORY.refresh(), self.outdated)
+        for row, lib in enumerate(self.current_libraries):
+            self.set_state_item(row, lib)
+        self.enable_buttons()
+    def filter_libraries(self):
+        search_text = self.search_input.text()
+        if not search_text.strip():
             current_index = self.category_combo.currentIndex()
             self.load_category(current_index)
             return
-        filtered_libraries = []
-        for lib in self.all_libraries:
-            if search_text in lib.get('name', '').lower():
-                filtered_libraries.append(lib)
+        if self.catalog is None:
+            return
+        filtered_libraries = self.catalog.index.search(search_text)
         self.current_libraries = filtered_libraries
         self.update_table(filtered_libraries)
     def enable_buttons(self):
@@ -277,11 +289,16 @@ class CategoryLibraryView(QWidget):
         if has_selection and selected_row >= 0 and selected_row < len(self.current_libraries):
             library = self.current_libraries[selected_row]
             install_name = library.get('install_name', '')
-            install_enabled = bool(install_name)
-            if not install_enabled:
+            state = self.install_state.get(library['key'])
+            install_enabled = bool(install_name) and (state is None or bool(state[1]))
+            if not install_name:
                 self.install_button.setText("Встроенная библиотека")
-            else:
+            elif state is None:
                 self.install_button.setText("Установить библиотеку")
+            elif state[1]:
+                self.install_button.setText(f"Обновить до {state[1]}")
+            else:
+                self.install_button.setText("Уже установлена")
         self.install_button.setEnabled(install_enabled)
         self.docs_button.setEnabled(has_selection)
     def request_install(self):
@@ -290,7 +307,19 @@ class CategoryLibraryView(QWidget):
             library = self.current_libraries[selected_row]
             install_name = library.get('install_name', '')
             if install_name:
-                self.install_requested.emit(install_name)
+                installed = PACKAGE_INVENTORY.get(install_name)
+                latest = self.outdated.get(library['key'])
+                if installed is None:
+                    self.install_requested.emit(install_name)
+                elif latest:
+                    self.update_requested.emit(install_name)
+                else:
+                    self.refresh_install_state()
+                    QMessageBox.information(
+                        self,
+                        "Информация",
+                        f"Библиотека {installed.name} {installed.version} уже установлена."
+                    )
             else:
                 QMessageBox.information(
                     self, 
@@ -314,17 +343,127 @@ class CategoryLibraryView(QWidget):
                 webbrowser.open(url)
             except Exception as e:
                 QMessageBox.warning(self, "Ошибка", f"Не удалось открыть документацию: {str(e)}")
+class InstalledPackagesModel(QAbstractTableModel):
+    HEADERS = ["Название", "Версия", "Обновление", "Статус"]
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.packages = {}
+        self.keys = []
+        self.outdated = {}
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.keys)
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        pkg = self.packages[self.keys[index.row()]]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return pkg.key
+            if column == 1:
+                return pkg.version
+            if column == 2:
+                return self.update_info(pkg.key)
+            if column == 3:
+                return "Установлен"
+        elif role == Qt.ItemDataRole.ForegroundRole and column == 2:
+            return self.update_color(pkg.key)
+        return None
+    def update_info(self, key):
+        outdated_pkg = self.outdated.get(key)
+        if not outdated_pkg:
+            return ""
+        return f"{outdated_pkg.get('version', '')} → {outdated_pkg.get('latest_version', '')}"
+    def update_color(self, key):
+        outdated_pkg = self.outdated.get(key)
+        if not outdated_pkg:
+            return None
+        try:
+            current_parts = outdated_pkg.get('version', '').split('.')
+            latest_parts = outdated_pkg.get('latest_version', '').split('.')
+            if current_parts[0] != latest_parts[0]:
+                return QColor(255, 165, 0)
+            return QColor(0, 128, 0)
+        except:
+            return None
+    def package_name(self, row):
+        return self.keys[row]
+    def has_update(self, row):
+        return 0 <= row < len(self.keys) and self.keys[row] in self.outdated
+    def set_packages(self, packages):
+        self.beginResetModel()
+        self.packages = {pkg.key: pkg for pkg in packages}
+        self.keys = sorted(self.packages)
+        self.endResetModel()
+    def set_outdated(self, outdated_list):
+        self.outdated = {canonicalize_name(pkg.get('name', '')): pkg for pkg in outdated_list}
+        if self.keys:
+            self.dataChanged.emit(self.index(0, 2), self.index(len(self.keys) - 1, 2))
+    def remove_package(self, key):
+        row = bisect.bisect_left(self.keys, key)
+        if row < len(self.keys) and self.keys[row] == key:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.keys[row]
+            del self.packages[key]
+            self.endRemoveRows()
+    def set_package(self, pkg):
+        row = bisect.bisect_left(self.keys, pkg.key)
+        if row < len(self.keys) and self.keys[row] == pkg.key:
+            self.packages[pkg.key] = pkg
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.keys.insert(row, pkg.key)
+        self.packages[pkg.key] = pkg
+        self.endInsertRows()
+    def apply_changes(self, added, removed, changed, index):
+        for key in set(removed) | set(changed):
+            outdated_pkg = self.outdated.get(key)
+            if outdated_pkg is None:
+                continue
+            if key not in index or index[key].version == outdated_pkg.get('latest_version'):
+                del self.outdated[key]
+            else:
+                self.outdated[key] = dict(outdated_pkg, version=index[key].version)
+        for key in removed:
+            self.remove_package(key)
+        for key in added + changed:
+            if key in index:
+                self.set_package(index[key])
 class InstalledPackagesView(QWidget):
     update_requested = pyqtSignal(str)
     uninstall_requested = pyqtSignal(str)
     show_details_requested = pyqtSignal(str)
     update_selected_requested = pyqtSignal(list)
     uninstall_selected_requested = pyqtSignal(list)
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, outdated_service=None):
         super().__init__(parent)
+        self.outdated_service = outdated_service or OutdatedService(self)
+        self.outdated_service.cached.connect(self.update_outdated_info)
+        self.outdated_service.finished.connect(self.update_outdated_info)
+        self.inventory = PACKAGE_INVENTORY
+        self.environment = None
+        self.environment_finder = None
+        self.scanners = []
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(2, 2, 2, 2)  
         self.layout.setSpacing(2)  
+        environment_layout = QHBoxLayout()
+        environment_layout.setSpacing(2)
+        self.environment_combo = QComboBox()
+        self.environment_combo.currentIndexChanged.connect(self.switch_environment)
+        self.add_environment_button = QPushButton("Добавить...")
+        self.add_environment_button.clicked.connect(self.add_environment)
+        environment_layout.addWidget(QLabel("Окружение:"))
+        environment_layout.addWidget(self.environment_combo, 1)
+        environment_layout.addWidget(self.add_environment_button)
+        self.layout.addLayout(environment_layout)
         search_layout = QHBoxLayout()
         search_layout.setSpacing(2)  
         self.search_input = QLineEdit()
@@ -333,12 +472,17 @@ class InstalledPackagesView(QWidget):
         search_layout.addWidget(QLabel("Поиск:"))
         search_layout.addWidget(self.search_input)
         self.layout.addLayout(search_layout)
-        self.table = QTableWidget(0, 4)
-        self.table.setHorizontalHeaderLabels(["Название", "Версия", "Обновление", "Статус"])
+        self.model = InstalledPackagesModel(self)
+        self.proxy_model = QSortFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.model)
+        self.proxy_model.setFilterKeyColumn(0)
+        self.proxy_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.table = QTableView()
+        self.table.setModel(self.proxy_model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SelectionMode.MultiSelection)
-        self.table.itemDoubleClicked.connect(self.on_item_double_clicked)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableView.SelectionMode.MultiSelection)
+        self.table.doubleClicked.connect(self.on_item_double_clicked)
         self.table.verticalHeader().setDefaultSectionSize(22)  
         self.layout.addWidget(self.table)
         button_layout = QHBoxLayout()
@@ -359,7 +503,7 @@ class InstalledPackagesView(QWidget):
         self.uninstall_selected_button.clicked.connect(self.request_uninstall_selected)
         self.uninstall_selected_button.setEnabled(False)
         self.refresh_button = QPushButton("Обновить список")
-        self.refresh_button.clicked.connect(self.refresh_packages)
+        self.refresh_button.clicked.connect(lambda: self.refresh_packages(force=True))
         button_layout.addWidget(self.info_button)
         button_layout.addWidget(self.update_button)
         button_layout.addWidget(self.update_selected_button)
@@ -367,130 +511,172 @@ class InstalledPackagesView(QWidget):
         button_layout.addWidget(self.uninstall_selected_button)
         button_layout.addWidget(self.refresh_button)
         self.layout.addLayout(button_layout)
-        self.packages = []
-        self.outdated = []
-        self.table.itemSelectionChanged.connect(self.enable_buttons)
-        self.refresh_packages()
-    def refresh_packages(self):
+        self.table.selectionModel().selectionChanged.connect(self.enable_buttons)
+        self.table.selectionModel().currentChanged.connect(self.enable_buttons)
+        self.watcher = SitePackagesWatcher(PACKAGE_INVENTORY, self)
+        self.watcher.packages_changed.connect(self.apply_package_changes)
+        self.populate_environments()
+        self.scan_environments([environment for environment in ENVIRONMENTS.environments()
+                                if not environment.is_current])
+    def is_current_environment(self):
+        return self.environment is None or self.environment.is_current
+    def populate_environments(self, selected_key=None):
+        self.environment_combo.blockSignals(True)
+        self.environment_combo.clear()
+        for environment in ENVIRONMENTS.environments():
+            self.environment_combo.addItem(environment.name, environment.key)
+            self.environment_combo.setItemData(self.environment_combo.count() - 1, environment.python,
+                                               Qt.ItemDataRole.ToolTipRole)
+        index = self.environment_combo.findData(selected_key) if selected_key else 0
+        self.environment_combo.setCurrentIndex(max(index, 0))
+        self.environment_combo.blockSignals(False)
+        self.switch_environment(self.environment_combo.currentIndex())
+    def add_environment(self):
+        python, _ = QFileDialog.getOpenFileName(self, "Выберите интерпретатор Python")
+        if not python:
+            return
+        environment = ENVIRONMENTS.add(python)
+        self.populate_environments(environment.key)
+    def switch_environment(self, index):
+        environment = ENVIRONMENTS.get(self.environment_combo.itemData(index))
+        if environment is None:
+            return
+        self.environment = environment
+        self.inventory = ENVIRONMENTS.inventory(environment)
+        self.search_input.clear()
+        if environment.is_current:
+            self.refresh_packages()
+            return
+        self.model.set_outdated([])
+        packages = self.inventory.cached()
+        self.model.set_packages(packages.values() if packages else [])
+        if packages:
+            self.check_environment_outdated()
+        self.scan_environments([environment])
+        self.enable_buttons()
+    def scan_environments(self, environments, force=False):
+        if not environments:
+            return
+        scanner = EnvironmentScanner(environments, force)
+        scanner.environment_scanned.connect(self.environment_scanned)
+        scanner.finished.connect(lambda: self.scanners.remove(scanner))
+        self.scanners.append(scanner)
+        scanner.start()
+    def environment_scanned(self, key, error):
+        if self.environment is None or self.environment.key != key or self.environment.is_current:
+            return
+        if error:
+            QMessageBox.warning(self, "Ошибка", f"Не удалось получить список пакетов {self.environment.python}: {error}")
+            return
+        packages = self.inventory.cached() or {}
+        if set(packages) != set(self.model.packages) or any(
+                pkg.version != self.model.packages[name].version for name, pkg in packages.items()):
+            self.model.set_packages(packages.values())
+            self.check_environment_outdated()
+        self.enable_buttons()
+    def check_environment_outdated(self, force=False):
+        finder = OutdatedPackagesFinder(list(self.model.packages.values()),
+                                        python_version=self.inventory.python_version, force=force,
+                                        python=self.environment.python)
+        finder.cached.connect(lambda outdated: self.update_environment_outdated(finder, outdated))
+        finder.finished.connect(lambda outdated: self.update_environment_outdated(finder, outdated))
+        self.environment_finder = finder
+        finder.start()
+    def update_environment_outdated(self, finder, outdated_list):
+        if finder is self.environment_finder:
+            self.model.set_outdated(outdated_list)
+            self.enable_buttons()
+    def refresh_packages(self, force=False):
+        if not self.is_current_environment():
+            self.scan_environments([self.environment], force)
+            if force:
+                self.check_environment_outdated(force)
+            return
         try:
             self.search_input.clear()
-            self.packages = list(pkg_resources.working_set)
-            self.outdated_finder = OutdatedPackagesFinder()
-            self.outdated_finder.finished.connect(self.update_outdated_info)
-            self.outdated_finder.start()
-            self.update_table()
+            self.model.set_packages(PACKAGE_INVENTORY.packages())
+            if self.outdated_service.outdated is not None:
+                self.model.set_outdated(self.outdated_service.outdated)
+            self.watcher.reset()
+            self.outdated_service.request(force)
+            self.enable_buttons()
         except Exception as e:
             QMessageBox.critical(self, "Ошибка", f"Не удалось загрузить список пакетов: {str(e)}")
     def update_outdated_info(self, outdated_list):
-        self.outdated = outdated_list
-        self.update_table()
-    def update_table(self):
-        search_text = self.search_input.text().lower()
-        self.table.setRowCount(0)
-        row = 0
-        for pkg in self.packages:
-            if search_text and search_text not in pkg.key.lower():
-                continue
-            self.table.insertRow(row)
-            name_item = QTableWidgetItem(pkg.key)
-            name_item.setFlags(name_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(row, 0, name_item)
-            version_item = QTableWidgetItem(pkg.version)
-            version_item.setFlags(version_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(row, 1, version_item)
-            update_info = ""
-            update_color = None
-            for outdated_pkg in self.outdated:
-                if outdated_pkg.get('name', '').lower() == pkg.key.lower():
-                    current_version = outdated_pkg.get('version', '')
-                    latest_version = outdated_pkg.get('latest_version', '')
-                    update_info = f"{current_version} → {latest_version}"
-                    try:
-                        current_parts = current_version.split('.')
-                        latest_parts = latest_version.split('.')
-                        if len(current_parts) > 0 and len(latest_parts) > 0:
-                            if current_parts[0] != latest_parts[0]:
-                                update_color = QColor(255, 165, 0)  
-                            else:
-                                update_color = QColor(0, 128, 0)  
-                    except:
-                        pass
-                    break
-            update_item = QTableWidgetItem(update_info)
-            update_item.setFlags(update_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            if update_color:
-                update_item.setForeground(update_color)
-            self.table.setItem(row, 2, update_item)
-            status = "Установлен"
-            status_item = QTableWidgetItem(status)
-            status_item.setFlags(status_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(row, 3, status_item)
-            row += 1
-    def filter_packages(self):
-        self.update_table()
-    def enable_buttons(self):
-        selected_items = self.table.selectedItems()
-        has_selection = len(selected_items) > 0
-        selected_rows = self.table.selectionModel().selectedRows()
+        if not self.is_current_environment():
+            return
+        self.model.set_outdated(outdated_list)
+        self.enable_buttons()
+    def sync_packages(self):
+        self.watcher.check()
+    def apply_package_changes(self, added, removed, changed):
+        DEPENDENCY_GRAPH.refresh()
+        if not self.is_current_environment():
+            return
+        self.model.apply_changes(added, removed, changed, PACKAGE_INVENTORY.refresh())
+        self.enable_buttons()
+    def filter_packages(self, text=None):
+        self.proxy_model.setFilterFixedString(self.search_input.text())
+    def selected_source_rows(self):
+        rows = []
+        for index in self.table.selectionModel().selectedRows():
+            rows.append(self.proxy_model.mapToSource(index).row())
+        return rows
+    def current_source_row(self):
+        index = self.table.currentIndex()
+        if not index.isValid():
+            return -1
+        return self.proxy_model.mapToSource(index).row()
+    def enable_buttons(self, *args):
+        selected_rows = self.selected_source_rows() if self.is_current_environment() else []
+        has_selection = len(selected_rows) > 0
         has_multiple_selection = len(selected_rows) > 1
         self.uninstall_button.setEnabled(has_selection)
         self.info_button.setEnabled(has_selection)
         self.uninstall_selected_button.setEnabled(has_multiple_selection)
         if has_selection:
-            row = self.table.currentRow()
-            update_info = self.table.item(row, 2).text()
-            self.update_button.setEnabled(bool(update_info))
-            has_updates = False
-            for row_index in selected_rows:
-                if row_index.row() < self.table.rowCount():
-                    update_info = self.table.item(row_index.row(), 2).text()
-                    if update_info:
-                        has_updates = True
-                        break
+            row = self.current_source_row()
+            self.update_button.setEnabled(row >= 0 and self.model.has_update(row))
+            has_updates = any(self.model.has_update(row) for row in selected_rows)
             self.update_selected_button.setEnabled(has_multiple_selection and has_updates)
         else:
             self.update_button.setEnabled(False)
             self.update_selected_button.setEnabled(False)
     def request_update(self):
-        selected_row = self.table.currentRow()
+        selected_row = self.current_source_row()
         if selected_row >= 0:
-            package_name = self.table.item(selected_row, 0).text()
+            package_name = self.model.package_name(selected_row)
             self.update_requested.emit(package_name)
     def request_uninstall(self):
-        selected_row = self.table.currentRow()
+        selected_row = self.current_source_row()
         if selected_row >= 0:
-            package_name = self.table.item(selected_row, 0).text()
+            package_name = self.model.package_name(selected_row)
             self.uninstall_requested.emit(package_name)
     def request_update_selected(self):
-        selected_rows = self.table.selectionModel().selectedRows()
+        selected_rows = self.selected_source_rows()
         if len(selected_rows) > 1:
             packages_to_update = []
-            for row_index in selected_rows:
-                if row_index.row() < self.table.rowCount():
-                    package_name = self.table.item(row_index.row(), 0).text()
-                    update_info = self.table.item(row_index.row(), 2).text()
-                    if update_info:
-                        packages_to_update.append(package_name)
+            for row in selected_rows:
+                if self.model.has_update(row):
+                    packages_to_update.append(self.model.package_name(row))
             if packages_to_update:
                 self.update_selected_requested.emit(packages_to_update)
     def request_uninstall_selected(self):
-        selected_rows = self.table.selectionModel().selectedRows()
+        selected_rows = self.selected_source_rows()
         if len(selected_rows) > 1:
-            packages_to_uninstall = []
-            for row_index in selected_rows:
-                if row_index.row() < self.table.rowCount():
-                    package_name = self.table.item(row_index.row(), 0).text()
-                    packages_to_uninstall.append(package_name)
+            packages_to_uninstall = [self.model.package_name(row) for row in selected_rows]
             if packages_to_uninstall:
                 self.uninstall_selected_requested.emit(packages_to_uninstall)
     def request_show_details(self):
-        selected_row = self.table.currentRow()
+        selected_row = self.current_source_row()
         if selected_row >= 0:
-            package_name = self.table.item(selected_row, 0).text()
+            package_name = self.model.package_name(selected_row)
             self.show_details_requested.emit(package_name)
-    def on_item_double_clicked(self, item):
-        row = item.row()
-        package_name = self.table.item(row, 0).text()
+    def on_item_double_clicked(self, index):
+        if not self.is_current_environment():
+            return
+        row = self.proxy_model.mapToSource(index).row()
+        package_name = self.model.package_name(row)
         self.show_details_requested.emit(package_name)
 class StatusDialog(QDialog):
     def __init__(self, parent=None):
@@ -506,15 +692,31 @@ class StatusDialog(QDialog):
         self.progress_bar = QProgressBar()
         self.progress_bar.setRange(0, 0)  
         layout.addWidget(self.progress_bar)
+        buttons_layout = QHBoxLayout()
+        self.cancel_button = QPushButton("Отмена")
+        self.cancel_button.clicked.connect(self.request_cancel)
+        self.cancel_button.setEnabled(False)
         self.close_button = QPushButton("Закрыть")
         self.close_button.clicked.connect(self.accept)
         self.close_button.setEnabled(False)
-        layout.addWidget(self.close_button)
+        buttons_layout.addWidget(self.cancel_button)
+        buttons_layout.addWidget(self.close_button)
+        layout.addLayout(buttons_layout)
+        self.cancel_handler = None
+    def set_cancel_handler(self, handler):
+        self.cancel_handler = handler
+        self.cancel_button.setEnabled(handler is not None)
+    def request_cancel(self):
+        if self.cancel_handler:
+            self.add_message("Отмена операции...")
+            self.cancel_button.setEnabled(False)
+            self.cancel_handler()
     def add_message(self, message):
         self.status_text.append(message)
     def operation_finished(self):
         self.progress_bar.setRange(0, 1)
         self.progress_bar.setValue(1)
+        self.cancel_button.setEnabled(False)
         self.close_button.setEnabled(True)
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -524,12 +726,13 @@ class MainWindow(QMainWindow):
         if APP_ICON:
             self.setWindowIcon(APP_ICON)
         self.history_manager = PackageHistoryManager()
+        self.outdated_service = OutdatedService(self)
         central_widget = QWidget()
         main_layout = QVBoxLayout(central_widget)
         main_layout.setContentsMargins(2, 2, 2, 2)  
         main_layout.setSpacing(2)  
         splitter = QSplitter(Qt.Orientation.Horizontal)
-        self.installed_packages = InstalledPackagesView()
+        self.installed_packages = InstalledPackagesView(outdated_service=self.outdated_service)
         self.installed_packages.update_requested.connect(self.update_package)
         self.installed_packages.uninstall_requested.connect(self.uninstall_package)
         self.installed_packages.show_details_requested.connect(self.show_package_details)
@@ -546,12 +749,19 @@ class MainWindow(QMainWindow):
         history_button.clicked.connect(self.show_history)
         size_analysis_button = QPushButton("Анализ размеров")
         size_analysis_button.clicked.connect(self.show_size_analysis)
+        drift_button = QPushButton("Сравнение окружений")
+        drift_button.clicked.connect(self.show_drift_report)
         buttons_layout.addWidget(history_button)
         buttons_layout.addWidget(size_analysis_button)
+        buttons_layout.addWidget(drift_button)
         installed_layout.addLayout(buttons_layout)
         splitter.addWidget(installed_group)
         self.category_view = CategoryLibraryView()
         self.category_view.install_requested.connect(self.install_package)
+        self.category_view.update_requested.connect(self.update_package)
+        self.outdated_service.cached.connect(self.category_view.set_outdated)
+        self.outdated_service.finished.connect(self.category_view.set_outdated)
+        self.installed_packages.watcher.packages_changed.connect(self.category_view.refresh_install_state)
         library_group = QGroupBox("Библиотеки по категориям")
         library_layout = QVBoxLayout(library_group)
         library_layout.setContentsMargins(2, 2, 2, 2)  
@@ -566,11 +776,10 @@ class MainWindow(QMainWindow):
         size_dialog = PackageSizeChartDialog(self)
         size_dialog.exec()
     def check_updates_on_startup(self):
-        self.installed_packages.refresh_packages()
-        self.startup_outdated_finder = OutdatedPackagesFinder()
-        self.startup_outdated_finder.finished.connect(self.show_update_notification)
-        self.startup_outdated_finder.start()
+        self.outdated_service.finished.connect(self.show_update_notification)
+        self.outdated_service.request()
     def show_update_notification(self, outdated_packages):
+        self.outdated_service.finished.disconnect(self.show_update_notification)
         if not outdated_packages:
             return
         update_dialog = UpdateNotifierDialog(outdated_packages, self)
@@ -581,13 +790,12 @@ class MainWindow(QMainWindow):
         dialog.setWindowTitle("Массовое обновление пакетов")
         updater = BulkPackageUpdater(outdated_packages)
         updater.progress.connect(dialog.add_message)
+        dialog.set_cancel_handler(updater.cancel)
         updater.package_updated.connect(self.package_updated_in_bulk)
         updater.finished.connect(dialog.operation_finished)
-        updater.finished.connect(self.installed_packages.refresh_packages)
+        updater.finished.connect(self.installed_packages.sync_packages)
         updater.start()
         dialog.exec()
-        # Дополнительное обновление после закрытия диалога
-        self.installed_packages.refresh_packages()
     def package_updated_in_bulk(self, package_name, success, message, previous_version):
         self.history_manager.add_operation(
             "update",
@@ -599,6 +807,10 @@ class MainWindow(QMainWindow):
     def show_package_details(self, package_name):
         detail_dialog = PackageDetailDialog(package_name, self)
         detail_dialog.exec()
+    def show_drift_report(self):
+        environment = self.installed_packages.environment
+        drift_dialog = DriftReportDialog(environment.key if environment else None, self)
+        drift_dialog.exec()
     def show_history(self):
         history_dialog = PackageHistoryDialog(self.history_manager, self)
         history_dialog.rollback_requested.connect(self.rollback_operation)
@@ -607,15 +819,12 @@ class MainWindow(QMainWindow):
         dialog = StatusDialog(self)
         dialog.setWindowTitle(f"Установка {package_name}")
         try:
-            current_version = None
-            for pkg in pkg_resources.working_set:
-                if pkg.key == package_name.lower():
-                    current_version = pkg.version
-                    break
+            current_version = PACKAGE_INVENTORY.get_version(package_name)
         except:
             current_version = None
         installer = PackageInstaller(package_name)
         installer.progress.connect(dialog.add_message)
+        dialog.set_cancel_handler(installer.cancel)
         installer.finished.connect(lambda success, message: 
                                   self.installation_finished(success, message, dialog, package_name, current_version))
         installer.start()
@@ -626,10 +835,7 @@ class MainWindow(QMainWindow):
         installed_version = None
         if success:
             try:
-                for pkg in pkg_resources.working_set:
-                    if pkg.key == package_name.lower():
-                        installed_version = pkg.version
-                        break
+                installed_version = PACKAGE_INVENTORY.get_version(package_name)
             except:
                 pass
         operation_type = "install"
@@ -645,20 +851,18 @@ class MainWindow(QMainWindow):
             success,
             message
         )
-        self.installed_packages.refresh_packages()
+        self.installed_packages.sync_packages()
     def update_package(self, package_name):
         dialog = StatusDialog(self)
         dialog.setWindowTitle(f"Обновление {package_name}")
         current_version = None
         try:
-            for pkg in pkg_resources.working_set:
-                if pkg.key == package_name.lower():
-                    current_version = pkg.version
-                    break
+            current_version = PACKAGE_INVENTORY.get_version(package_name)
         except:
             pass
         installer = PackageInstaller(package_name, upgrade=True)
         installer.progress.connect(dialog.add_message)
+        dialog.set_cancel_handler(installer.cancel)
         installer.finished.connect(lambda success, message: 
                                   self.update_finished(success, message, dialog, package_name, current_version))
         installer.start()
@@ -673,14 +877,11 @@ class MainWindow(QMainWindow):
             success,
             message
         )
-        self.installed_packages.refresh_packages()
+        self.installed_packages.sync_packages()
     def uninstall_package(self, package_name):
         current_version = None
         try:
-            for pkg in pkg_resources.working_set:
-                if pkg.key == package_name.lower():
-                    current_version = pkg.version
-                    break
+            current_version = PACKAGE_INVENTORY.get_version(package_name)
         except:
             pass
         reply = QMessageBox.question(
@@ -694,6 +895,7 @@ class MainWindow(QMainWindow):
             dialog.setWindowTitle(f"Удаление {package_name}")
             uninstaller = PackageUninstaller(package_name)
             uninstaller.progress.connect(dialog.add_message)
+            dialog.set_cancel_handler(uninstaller.cancel)
             uninstaller.finished.connect(lambda success, message: 
                                        self.uninstallation_finished(success, message, dialog, package_name, current_version))
             uninstaller.start()
@@ -708,7 +910,7 @@ class MainWindow(QMainWindow):
             success,
             message
         )
-        self.installed_packages.refresh_packages()
+        self.installed_packages.sync_packages()
     def update_selected_packages(self, package_names):
         if not package_names:
             return
@@ -718,22 +920,19 @@ class MainWindow(QMainWindow):
         for package_name in package_names:
             current_version = None
             try:
-                for pkg in pkg_resources.working_set:
-                    if pkg.key == package_name.lower():
-                        current_version = pkg.version
-                        break
+                current_version = PACKAGE_INVENTORY.get_version(package_name)
             except:
                 pass
             packages_with_versions.append({"name": package_name, "version": current_version})
         updater = BulkPackageUpdater(packages_with_versions)
         updater.progress.connect(dialog.add_message)
+        dialog.set_cancel_handler(updater.cancel)
         updater.package_updated.connect(lambda name, success, message, prev_version: 
                                       self.package_updated_in_bulk(name, success, message, prev_version))
         updater.finished.connect(dialog.operation_finished)
-        updater.finished.connect(self.installed_packages.refresh_packages)
+        updater.finished.connect(self.installed_packages.sync_packages)
         updater.start()
         dialog.exec()
-        self.installed_packages.refresh_packages()
     def uninstall_selected_packages(self, package_names):
         if not package_names:
             return
@@ -749,13 +948,13 @@ class MainWindow(QMainWindow):
             dialog.setWindowTitle(f"Удаление {len(package_names)} пакетов")
             uninstaller = BulkPackageUninstaller(package_names)
             uninstaller.progress.connect(dialog.add_message)
+            dialog.set_cancel_handler(uninstaller.cancel)
             uninstaller.package_uninstalled.connect(lambda name, success, message, version: 
                                                   self.package_uninstalled_in_bulk(name, success, message, version))
             uninstaller.finished.connect(dialog.operation_finished)
-            uninstaller.finished.connect(self.installed_packages.refresh_packages)
+            uninstaller.finished.connect(self.installed_packages.sync_packages)
             uninstaller.start()
             dialog.exec()
-            self.installed_packages.refresh_packages()
     def package_updated_in_bulk(self, package_name, success, message, previous_version):
         self.history_manager.add_operation(
             "update",
@@ -775,7 +974,7 @@ class MainWindow(QMainWindow):
     def rollback_operation(self, operation):
         dialog = StatusDialog(self)
         dialog.setWindowTitle(f"Откат операции для {operation.get('package')}")
-        class RollbackThread(QThread):
+        class RollbackThread(PipWorker):
             finished = pyqtSignal(bool, str)
             progress = pyqtSignal(str)
             def __init__(self, history_manager, operation):
@@ -784,116 +983,100 @@ class MainWindow(QMainWindow):
                 self.operation = operation
             def run(self):
                 self.progress.emit(f"Выполняется откат операции...")
-                success, message = self.history_manager.rollback_operation(self.operation)
+                success, message = self.history_manager.rollback_operation(
+                    self.operation, self.progress.emit, self.cancel_event)
                 self.finished.emit(success, message)
         rollback_thread = RollbackThread(self.history_manager, operation)
         rollback_thread.progress.connect(dialog.add_message)
+        dialog.set_cancel_handler(rollback_thread.cancel)
         rollback_thread.finished.connect(lambda success, message: self.rollback_finished(success, message, dialog))
         rollback_thread.start()
         dialog.exec()
     def rollback_finished(self, success, message, dialog):
         dialog.add_message(message)
         dialog.operation_finished()
-        self.installed_packages.refresh_packages()
-class PackageHistoryManager:
-    def __init__(self, history_file="package_history.json"):
-        self.history_file = history_file
-        self.history = self._load_history()
-    def _load_history(self):
-        try:
-            if os.path.exists(self.history_file):
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            return {"operations": []}
-        except Exception as e:
-            print(f"Ошибка при загрузке истории: {e}")
-            return {"operations": []}
-    def _save_history(self):
-        try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Ошибка при сохранении истории: {e}")
-    def add_operation(self, operation_type, package_name, version=None, success=True, details=None):
-        timestamp = datetime.datetime.now().isoformat()
-        operation = {
-            "timestamp": timestamp,
-            "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "type": operation_type,
-            "package": package_name,
-            "version": version,
-            "success": success,
-            "details": details or ""
-        }
-        self.history["operations"].append(operation)
-        self._save_history()
-        return operation
-    def get_operations(self, package_name=None, operation_type=None, limit=None):
-        operations = self.history["operations"]
-        if package_name:
-            operations = [op for op in operations if op["package"] == package_name]
-        if operation_type:
-            operations = [op for op in operations if op["type"] == operation_type]
-        operations = sorted(operations, key=lambda x: x["timestamp"], reverse=True)
-        if limit and isinstance(limit, int) and limit > 0:
-            operations = operations[:limit]
-        return operations
-    def can_rollback(self, operation):
-        if not operation or not isinstance(operation, dict):
-            return False
-        op_type = operation.get("type")
-        success = operation.get("success", False)
-        if not success:
-            return False
-        if op_type == "install":
-            return True
-        elif op_type == "uninstall":
-            return operation.get("version") is not None
-        elif op_type == "update":
-            return operation.get("version") is not None
-        return False
-    def rollback_operation(self, operation):
-        if not self.can_rollback(operation):
-            return False, "Невозможно откатить эту операцию"
-        op_type = operation.get("type")
-        package = operation.get("package")
-        version = operation.get("version")
-        cmd = ["pip"]
-        if op_type == "install":
-            cmd.extend(["uninstall", "-y", package])
-            rollback_type = "uninstall_rollback"
-        elif op_type == "uninstall":
-            cmd.extend(["install", f"{package}=={version}"])
-            rollback_type = "install_rollback"
-        elif op_type == "update":
-            cmd.extend(["install", f"{package}=={version}"])
-            rollback_type = "downgrade_rollback"
-        try:
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            stdout, stderr = process.communicate()
-            success = process.returncode == 0
-            details = stdout if success else stderr
-            self.add_operation(
-                rollback_type,
-                package,
-                version,
-                success,
-                f"Откат операции от {operation.get('date')}: {details}"
-            )
-            return success, "Откат выполнен успешно" if success else f"Ошибка отката: {stderr}"
-        except Exception as e:
-            return False, f"Ошибка при откате: {str(e)}"
+        self.installed_packages.sync_packages()
+class HistoryTableModel(QAbstractTableModel):
+    HEADERS = ["Дата", "Операция", "Пакет", "Версия", "Статус"]
+    OPERATION_NAMES = {
+        "install": "Установка",
+        "uninstall": "Удаление",
+        "update": "Обновление",
+        "install_rollback": "Откат (установка)",
+        "uninstall_rollback": "Откат (удаление)",
+        "downgrade_rollback": "Откат (понижение)"
+    }
+    def __init__(self, history_manager, parent=None):
+        super().__init__(parent)
+        self.history_manager = history_manager
+        self.operations = []
+        self.package_name = None
+        self.operation_type = None
+        self.total = 0
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.operations)
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        op = self.operations[index.row()]
+        column = index.column()
+        success = op.get("success", False)
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return op.get("date", "")
+            if column == 1:
+                return self.operation_name(op.get("type", ""))
+            if column == 2:
+                return op.get("package", "")
+            if column == 3:
+                return op.get("version", "") or ""
+            if column == 4:
+                return "Успешно" if success else "Ошибка"
+        elif role == Qt.ItemDataRole.ForegroundRole and column == 4:
+            return QColor(0, 128, 0) if success else QColor(255, 0, 0)
+        return None
+    def operation_name(self, operation_type):
+        return self.OPERATION_NAMES.get(operation_type, operation_type)
+    def operation(self, row):
+        if 0 <= row < len(self.operations):
+            return self.operations[row]
+        return None
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self.operations) < self.total
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        operations = self.history_manager.get_operations(
+            self.package_name, self.operation_type, HISTORY_PAGE_SIZE, len(self.operations),
+            prefix=True, details=False)
+        if not operations:
+            self.total = len(self.operations)
+            return
+        start = len(self.operations)
+        self.beginInsertRows(QModelIndex(), start, start + len(operations) - 1)
+        self.operations.extend(operations)
+        self.endInsertRows()
+    def set_filter(self, package_name=None, operation_type=None):
+        self.beginResetModel()
+        self.package_name = package_name
+        self.operation_type = operation_type
+        self.operations = []
+        self.total = self.history_manager.count_operations(package_name, operation_type, prefix=True)
+        self.endResetModel()
+        if self.canFetchMore():
+            self.fetchMore()
 class PackageHistoryDialog(QDialog):
     rollback_requested = pyqtSignal(dict)
     def __init__(self, history_manager, parent=None):
         super().__init__(parent)
         self.history_manager = history_manager
-        self.operations = []
+        self.model = HistoryTableModel(history_manager, self)
         self.setWindowTitle("История операций с пакетами")
         self.setMinimumSize(800, 500)
         if APP_ICON:
@@ -921,13 +1104,16 @@ class PackageHistoryDialog(QDialog):
         self.refresh_button.clicked.connect(self.load_operations)
         filter_layout.addWidget(self.refresh_button)
         layout.addLayout(filter_layout)
-        self.history_table = QTableWidget(0, 5)
-        self.history_table.setHorizontalHeaderLabels(["Дата", "Операция", "Пакет", "Версия", "Статус"])
+        self.history_table = QTableView()
+        self.history_table.setModel(self.model)
         self.history_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.history_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.history_table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
-        self.history_table.itemSelectionChanged.connect(self.update_rollback_button)
+        self.history_table.verticalHeader().setVisible(False)
+        self.history_table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.history_table.setSelectionMode(QTableView.SelectionMode.SingleSelection)
+        self.history_table.selectionModel().selectionChanged.connect(self.update_rollback_button)
         layout.addWidget(self.history_table)
+        self.count_label = QLabel("")
+        layout.addWidget(self.count_label)
         details_group = QGroupBox("Детали операции")
         details_layout = QVBoxLayout(details_group)
         self.details_text = QTextEdit()
@@ -949,56 +1135,24 @@ class PackageHistoryDialog(QDialog):
         package_name = self.package_search.text().strip()
         if not package_name:
             package_name = None
-        self.operations = self.history_manager.get_operations(package_name, operation_type)
-        self.history_table.setRowCount(0)
-        for i, op in enumerate(self.operations):
-            self.history_table.insertRow(i)
-            date_item = QTableWidgetItem(op.get("date", ""))
-            date_item.setFlags(date_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.history_table.setItem(i, 0, date_item)
-            operation_type = op.get("type", "")
-            operation_name = self.get_operation_name(operation_type)
-            type_item = QTableWidgetItem(operation_name)
-            type_item.setFlags(type_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.history_table.setItem(i, 1, type_item)
-            package_item = QTableWidgetItem(op.get("package", ""))
-            package_item.setFlags(package_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.history_table.setItem(i, 2, package_item)
-            version_item = QTableWidgetItem(op.get("version", "") or "")
-            version_item.setFlags(version_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.history_table.setItem(i, 3, version_item)
-            success = op.get("success", False)
-            status_text = "Успешно" if success else "Ошибка"
-            status_item = QTableWidgetItem(status_text)
-            status_item.setFlags(status_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            status_item.setForeground(QColor(0, 128, 0) if success else QColor(255, 0, 0))
-            self.history_table.setItem(i, 4, status_item)
+        self.model.set_filter(package_name, operation_type)
+        self.count_label.setText(f"Операций: {self.model.total}")
         self.details_text.clear()
         self.update_rollback_button()
     def get_operation_name(self, operation_type):
-        operation_names = {
-            "install": "Установка",
-            "uninstall": "Удаление",
-            "update": "Обновление",
-            "install_rollback": "Откат (установка)",
-            "uninstall_rollback": "Откат (удаление)",
-            "downgrade_rollback": "Откат (понижение)"
-        }
-        return operation_names.get(operation_type, operation_type)
-    def update_rollback_button(self):
+        return self.model.operation_name(operation_type)
+    def selected_operation(self):
         selected_rows = self.history_table.selectionModel().selectedRows()
         if not selected_rows:
+            return None
+        return self.model.operation(selected_rows[0].row())
+    def update_rollback_button(self, *args):
+        operation = self.selected_operation()
+        if operation is None:
             self.rollback_button.setEnabled(False)
             self.details_text.clear()
             return
-        row = selected_rows[0].row()
-        if row < 0 or row >= len(self.operations):
-            self.rollback_button.setEnabled(False)
-            self.details_text.clear()
-            return
-        operation = self.operations[row]
-        details = operation.get("details", "")
-        self.details_text.setText(details)
+        self.details_text.setPlainText(self.history_manager.get_operation_details(operation))
         can_rollback = self.history_manager.can_rollback(operation)
         self.rollback_button.setEnabled(can_rollback)
         if can_rollback:
@@ -1006,13 +1160,9 @@ class PackageHistoryDialog(QDialog):
         else:
             self.rollback_button.setText("Откат невозможен")
     def rollback_selected_operation(self):
-        selected_rows = self.history_table.selectionModel().selectedRows()
-        if not selected_rows:
+        operation = self.selected_operation()
+        if operation is None:
             return
-        row = selected_rows[0].row()
-        if row < 0 or row >= len(self.operations):
-            return
-        operation = self.operations[row]
         reply = QMessageBox.question(
             self,
             "Подтверждение отката",
@@ -1025,6 +1175,7 @@ class PackageHistoryDialog(QDialog):
             self.accept()  
 class PackageDetailThread(QThread):
     finished = pyqtSignal(dict)
+    size_ready = pyqtSignal(object)
     def __init__(self, package_name):
         super().__init__()
         self.package_name = package_name
@@ -1043,48 +1194,18 @@ class PackageDetailThread(QThread):
             "metadata": {}
         }
         try:
-            process = subprocess.Popen(
-                ["pip", "show", self.package_name],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            stdout, stderr = process.communicate()
-            if process.returncode == 0:
-                for line in stdout.splitlines():
-                    if ":" in line:
-                        key, value = line.split(":", 1)
-                        key = key.strip().lower().replace("-", "_")
-                        value = value.strip()
-                        if key == "requires":
-                            if value:
-                                result["requires"] = [req.strip() for req in value.split(",")]
-                            else:
-                                result["requires"] = []
-                        elif key == "required_by":
-                            if value and value != "":
-                                result["required_by"] = [req.strip() for req in value.split(",")]
-                            else:
-                                result["required_by"] = []
-                        else:
-                            result[key] = value
-            try:
-                dist = None
-                for pkg in pkg_resources.working_set:
-                    if pkg.key == self.package_name.lower():
-                        dist = pkg
-                        break
-                if dist:
-                    if hasattr(dist, "_get_metadata"):
-                        for key in dist._get_metadata("PKG-INFO"):
-                            if ":" in key:
-                                meta_key, meta_value = key.split(":", 1)
-                                result["metadata"][meta_key.strip()] = meta_value.strip()
-            except:
-                pass
+            details = DEPENDENCY_GRAPH.package_details(self.package_name)
+            if details:
+                result.update(details)
         except Exception as e:
             print(f"Ошибка при получении информации о пакете: {e}")
         self.finished.emit(result)
+        size_info = None
+        try:
+            size_info = package_size(self.package_name)
+        except Exception as e:
+            print(f"Ошибка при вычислении размера пакета: {e}")
+        self.size_ready.emit(size_info)
 class PackageDetailDialog(QDialog):
     def __init__(self, package_name, parent=None):
         super().__init__(parent)
@@ -1159,6 +1280,7 @@ class PackageDetailDialog(QDialog):
     def load_package_info(self):
         self.detail_thread = PackageDetailThread(self.package_name)
         self.detail_thread.finished.connect(self.update_package_info)
+        self.detail_thread.size_ready.connect(self.update_package_size)
         self.detail_thread.start()
     def update_package_info(self, package_info):
         self.loading_label.setVisible(False)
@@ -1171,8 +1293,10 @@ class PackageDetailDialog(QDialog):
             ("Email автора", package_info.get("author_email", "")),
             ("Лицензия", package_info.get("license", "")),
             ("Домашняя страница", package_info.get("home_page", "")),
-            ("Расположение", package_info.get("location", ""))
+            ("Расположение", package_info.get("location", "")),
+            ("Размер", "вычисляется...")
         ]
+        self.size_row = len(info_items) - 1
         for i, (key, value) in enumerate(info_items):
             self.info_table.insertRow(i)
             key_item = QTableWidgetItem(key)
@@ -1199,6 +1323,16 @@ class PackageDetailDialog(QDialog):
             value_item = QTableWidgetItem(value)
             value_item.setFlags(value_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
             self.metadata_table.setItem(i, 1, value_item)
+    def update_package_size(self, size_info):
+        if getattr(self, "size_row", None) is None:
+            return
+        if not size_info:
+            self.info_table.removeRow(self.size_row)
+            self.size_row = None
+            return
+        value_item = QTableWidgetItem(f"{size_info.get('size_mb', 0):.2f} МБ ({size_info.get('file_count', 0)} файлов)")
+        value_item.setFlags(value_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+        self.info_table.setItem(self.size_row, 1, value_item)
     def open_docs(self):
         url = f"https://pypi.org/project/{self.package_name}/"
         try:
@@ -1277,41 +1411,20 @@ class UpdateNotifierDialog(QDialog):
     def request_update_all(self):
         self.update_all_requested.emit()
         self.accept()
-class BulkPackageUpdater(QThread):
+class BulkPackageUpdater(PipWorker):
     progress = pyqtSignal(str)
     package_updated = pyqtSignal(str, bool, str, str)  
     finished = pyqtSignal()
-    def __init__(self, packages):
+    def __init__(self, packages, batch=True, max_workers=BULK_UPDATE_WORKERS):
         super().__init__()
         self.packages = packages
+        self.batch = batch
+        self.max_workers = max_workers
     def run(self):
-        total = len(self.packages)
-        self.progress.emit(f"Начало обновления {total} пакетов...")
-        for i, pkg in enumerate(self.packages):
-            package_name = pkg.get('name', '')
-            current_version = pkg.get('version', '')
-            if not package_name:
-                continue
-            self.progress.emit(f"[{i+1}/{total}] Обновление {package_name} ({current_version})...")
-            cmd = ["pip", "install", "--upgrade", package_name]
-            try:
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True
-                )
-                stdout, stderr = process.communicate()
-                success = process.returncode == 0
-                message = stdout if success else stderr
-                self.progress.emit(f"{'Успешно' if success else 'Ошибка'}: {message}")
-                self.package_updated.emit(package_name, success, message, current_version)
-            except Exception as e:
-                self.progress.emit(f"Ошибка при обновлении {package_name}: {str(e)}")
-                self.package_updated.emit(package_name, False, str(e), current_version)
-        self.progress.emit(f"Обновление завершено.")
+        BulkUpdate(self.packages, self.batch, self.max_workers,
+                   self.progress.emit, self.package_updated.emit, self.cancel_event).run()
         self.finished.emit()
-class BulkPackageUninstaller(QThread):
+class BulkPackageUninstaller(PipWorker):
     progress = pyqtSignal(str)
     package_uninstalled = pyqtSignal(str, bool, str, str)
     finished = pyqtSignal()
@@ -1319,115 +1432,148 @@ class BulkPackageUninstaller(QThread):
         super().__init__()
         self.package_names = package_names
     def run(self):
-        total = len(self.package_names)
-        self.progress.emit(f"Начало удаления {total} пакетов...")
-        for i, package_name in enumerate(self.package_names):
-            if not package_name:
-                continue
-            current_version = None
-            try:
-                for pkg in pkg_resources.working_set:
-                    if pkg.key == package_name.lower():
-                        current_version = pkg.version
-                        break
-            except:
-                pass
-            self.progress.emit(f"[{i+1}/{total}] Удаление {package_name} ({current_version or 'неизвестная версия'})...")
-            try:
-                deps_process = subprocess.Popen(
-                    ["pip", "show", package_name], 
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True
-                )
-                stdout, stderr = deps_process.communicate()
-                if deps_process.returncode == 0:
-                    required_by = None
-                    for line in stdout.split('\n'):
-                        if line.startswith("Required-by:"):
-                            required_by = line[len("Required-by:"):].strip()
-                            break
-                    if required_by and required_by != "":
-                        self.progress.emit(f"Пропуск {package_name}: требуется для {required_by}")
-                        self.package_uninstalled.emit(package_name, False, f"Пакет требуется для: {required_by}", current_version)
-                        continue
-            except:
-                pass
-            cmd = ["pip", "uninstall", "-y", package_name]
-            try:
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True
-                )
-                stdout, stderr = process.communicate()
-                success = process.returncode == 0
-                message = stdout if success else stderr
-                self.progress.emit(f"{'Успешно' if success else 'Ошибка'}: {message}")
-                self.package_uninstalled.emit(package_name, success, message, current_version)
-            except Exception as e:
-                self.progress.emit(f"Ошибка при удалении {package_name}: {str(e)}")
-                self.package_uninstalled.emit(package_name, False, str(e), current_version)
-        self.progress.emit(f"Удаление завершено.")
+        BulkUninstall(self.package_names, self.progress.emit, self.package_uninstalled.emit, self.cancel_event).run()
+        self.finished.emit()
+class EnvironmentScanner(PipWorker):
+    environment_scanned = pyqtSignal(str, str)
+    finished = pyqtSignal()
+    def __init__(self, environments, force=False, max_workers=ENVIRONMENT_WORKERS):
+        super().__init__()
+        self.environments = environments
+        self.force = force
+        self.max_workers = max_workers
+    def run(self):
+        ENVIRONMENTS.refresh_all(self.environments, self.force, self.max_workers,
+                                 lambda environment, error: self.environment_scanned.emit(environment.key, error or ""),
+                                 self.cancel_event)
         self.finished.emit()
-class PackageSizeAnalyzer(QThread):
+class DriftReportWorker(PipWorker):
+    finished = pyqtSignal(dict, str)
+    def __init__(self, baseline, target):
+        super().__init__()
+        self.baseline = baseline
+        self.target = target
+    def run(self):
+        (_, baseline, baseline_error), (_, target, target_error) = load_drift_sources([self.baseline, self.target])
+        if baseline_error or target_error:
+            self.finished.emit({}, baseline_error or target_error)
+            return
+        self.finished.emit(drift_report(baseline, target), "")
+class PackageSizeAnalyzer(PipWorker):
     progress = pyqtSignal(str)
+    partial = pyqtSignal(list)
     finished = pyqtSignal(list)
-    def __init__(self, packages=None):
+    def __init__(self, packages=None, max_workers=SIZE_ANALYSIS_WORKERS, cache=None, accounting="apparent"):
         super().__init__()
         self.packages = packages or []
+        self.max_workers = max_workers
+        self.cache = cache
+        self.accounting = accounting
     def run(self):
-        result = []
-        if not self.packages:
-            self.packages = list(pkg_resources.working_set)
-        total = len(self.packages)
-        self.progress.emit(f"Анализ размеров {total} пакетов...")
-        for i, pkg in enumerate(self.packages):
-            if isinstance(pkg, dict):
-                package_name = pkg.get('name', '')
-            else:
-                package_name = pkg.key
-            if not package_name:
-                continue
-            self.progress.emit(f"[{i+1}/{total}] Анализ размера {package_name}...")
-            try:
-                process = subprocess.Popen(
-                    ["pip", "show", "-f", package_name],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True
-                )
-                stdout, stderr = process.communicate()
-                if process.returncode == 0:
-                    location = ""
-                    files = []
-                    in_files_section = False
-                    for line in stdout.splitlines():
-                        if line.startswith("Location:"):
-                            location = line.split(":", 1)[1].strip()
-                        elif line.startswith("Files:"):
-                            in_files_section = True
-                        elif in_files_section and line.strip():
-                            files.append(line.strip())
-                    total_size = 0
-                    for file_path in files:
-                        full_path = os.path.join(location, file_path)
-                        if os.path.isfile(full_path):
-                            total_size += os.path.getsize(full_path)
-                    package_info = {
-                        "name": package_name,
-                        "size": total_size,
-                        "size_mb": round(total_size / (1024 * 1024), 2),
-                        "file_count": len(files),
-                        "location": location
-                    }
-                    result.append(package_info)
-            except Exception as e:
-                self.progress.emit(f"Ошибка при анализе {package_name}: {str(e)}")
-        result.sort(key=lambda x: x.get("size", 0), reverse=True)
-        self.progress.emit(f"Анализ завершен.")
-        self.finished.emit(result)
+        analysis = SizeAnalysis(self.packages, self.max_workers, self.cache, self.accounting,
+                                self.progress.emit, self.partial.emit, self.cancel_event)
+        self.finished.emit(analysis.run())
+class DriftReportDialog(QDialog):
+    CHANGE_NAMES = {
+        "added": "Добавлен",
+        "removed": "Отсутствует",
+        "upgraded": "Новее",
+        "downgraded": "Старее",
+        "changed": "Другая версия"
+    }
+    CHANGE_COLORS = {
+        "added": QColor(0, 128, 0),
+        "removed": QColor(200, 0, 0),
+        "upgraded": QColor(0, 90, 200),
+        "downgraded": QColor(255, 140, 0),
+        "changed": QColor(128, 0, 128)
+    }
+    def __init__(self, baseline_key=None, parent=None):
+        super().__init__(parent)
+        self.worker = None
+        self.setWindowTitle("Сравнение окружений")
+        self.setMinimumSize(800, 600)
+        if APP_ICON:
+            self.setWindowIcon(APP_ICON)
+        self.init_ui(baseline_key)
+    def init_ui(self, baseline_key):
+        layout = QVBoxLayout(self)
+        sources_layout = QHBoxLayout()
+        self.baseline_combo = QComboBox()
+        self.target_combo = QComboBox()
+        for environment in ENVIRONMENTS.environments():
+            for combo in (self.baseline_combo, self.target_combo):
+                combo.addItem(environment.name, environment.key)
+                combo.setItemData(combo.count() - 1, environment.python, Qt.ItemDataRole.ToolTipRole)
+        self.baseline_combo.setCurrentIndex(max(self.baseline_combo.findData(baseline_key), 0))
+        self.target_combo.setCurrentIndex(1 if self.target_combo.count() > 1 else 0)
+        lockfile_button = QPushButton("Файл блокировки...")
+        lockfile_button.clicked.connect(self.add_lockfile)
+        self.compare_button = QPushButton("Сравнить")
+        self.compare_button.clicked.connect(self.compare)
+        sources_layout.addWidget(QLabel("Эталон:"))
+        sources_layout.addWidget(self.baseline_combo, 1)
+        sources_layout.addWidget(QLabel("Сравнить с:"))
+        sources_layout.addWidget(self.target_combo, 1)
+        sources_layout.addWidget(lockfile_button)
+        sources_layout.addWidget(self.compare_button)
+        layout.addLayout(sources_layout)
+        self.summary_label = QLabel("")
+        layout.addWidget(self.summary_label)
+        self.table = QTableWidget(0, 4)
+        self.table.setHorizontalHeaderLabels(["Пакет", "Изменение", "Эталон", "Сравниваемое"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        layout.addWidget(self.table)
+        close_button = QPushButton("Закрыть")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+    def add_lockfile(self):
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Выберите файл блокировки", "",
+            "Файлы блокировки (*.txt *.in *.lock *.json *.toml);;Все файлы (*)")
+        if not path:
+            return
+        for combo in (self.baseline_combo, self.target_combo):
+            if combo.findData(path) < 0:
+                combo.addItem(os.path.basename(path), path)
+                combo.setItemData(combo.count() - 1, path, Qt.ItemDataRole.ToolTipRole)
+        self.target_combo.setCurrentIndex(self.target_combo.findData(path))
+    def compare(self):
+        self.compare_button.setEnabled(False)
+        self.summary_label.setText("Сравнение...")
+        self.worker = DriftReportWorker(self.baseline_combo.currentData(), self.target_combo.currentData())
+        self.worker.finished.connect(self.show_report)
+        self.worker.start()
+    def show_report(self, report, error):
+        self.compare_button.setEnabled(True)
+        if error:
+            self.summary_label.setText("")
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сравнить окружения: {error}")
+            return
+        rows = []
+        for change in ("added", "removed", "upgraded", "downgraded", "changed"):
+            for item in report[change]:
+                if change == "added":
+                    rows.append((item["name"], change, "", item["version"] or ""))
+                elif change == "removed":
+                    rows.append((item["name"], change, item["version"] or "", ""))
+                else:
+                    rows.append((item["name"], change, item["from"], item["to"]))
+        self.summary_label.setText(", ".join(
+            [f"{self.CHANGE_NAMES[change]}: {len(report[change])}" for change in self.CHANGE_NAMES] +
+            [f"Совпадает: {report['unchanged']}"]))
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(0)
+        self.table.setRowCount(len(rows))
+        for i, (name, change, baseline_version, target_version) in enumerate(rows):
+            for column, text in enumerate((name, self.CHANGE_NAMES[change], baseline_version, target_version)):
+                item = QTableWidgetItem(text)
+                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+                if column == 1:
+                    item.setForeground(self.CHANGE_COLORS[change])
+                self.table.setItem(i, column, item)
+        self.table.setUpdatesEnabled(True)
 class PackageSizeChartDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -1435,9 +1581,17 @@ class PackageSizeChartDialog(QDialog):
         self.setMinimumSize(800, 600)
         if APP_ICON:
             self.setWindowIcon(APP_ICON)
+        self.analyzer = None
+        self.size_data = []
+        self.charts_dirty = False
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setInterval(CHART_REDRAW_INTERVAL)
+        self.redraw_timer.timeout.connect(self.redraw_charts)
         self.init_ui()
         self.start_analysis()
     def init_ui(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
         layout = QVBoxLayout(self)
         header_label = QLabel("Анализ размеров установленных пакетов")
         header_font = QFont()
@@ -1460,8 +1614,9 @@ class PackageSizeChartDialog(QDialog):
         self.tab_widget.addTab(self.bar_tab, "Гистограмма")
         self.table_tab = QWidget()
         table_layout = QVBoxLayout(self.table_tab)
-        self.size_table = QTableWidget(0, 4)
-        self.size_table.setHorizontalHeaderLabels(["Пакет", "Размер (МБ)", "Количество файлов", "Расположение"])
+        self.size_table = QTableWidget(0, 6)
+        self.size_table.setHorizontalHeaderLabels(
+            ["Пакет", "Размер (МБ)", "Освобождается (МБ)", "Общие (МБ)", "Количество файлов", "Расположение"])
         self.size_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         table_layout.addWidget(self.size_table)
         self.tab_widget.addTab(self.table_tab, "Таблица")
@@ -1474,9 +1629,15 @@ class PackageSizeChartDialog(QDialog):
         buttons_layout = QHBoxLayout()
         refresh_button = QPushButton("Обновить")
         refresh_button.clicked.connect(self.start_analysis)
+        self.accounting_combo = QComboBox()
+        self.accounting_combo.addItem("Размер файлов", "apparent")
+        self.accounting_combo.addItem("Место на диске (без дублей)", "disk")
+        self.accounting_combo.currentIndexChanged.connect(self.start_analysis)
         close_button = QPushButton("Закрыть")
         close_button.clicked.connect(self.accept)
         buttons_layout.addWidget(refresh_button)
+        buttons_layout.addWidget(QLabel("Учет:"))
+        buttons_layout.addWidget(self.accounting_combo)
         buttons_layout.addStretch()
         buttons_layout.addWidget(close_button)
         layout.addLayout(buttons_layout)
@@ -1484,18 +1645,58 @@ class PackageSizeChartDialog(QDialog):
         self.status_label.setText("Анализ размеров пакетов...")
         self.progress_bar.setRange(0, 0)  
         self.size_table.setRowCount(0)
-        self.analyzer = PackageSizeAnalyzer()
+        self.stop_analysis()
+        self.size_data = []
+        self.charts_dirty = False
+        accounting = self.accounting_combo.currentData()
+        self.size_table.setColumnHidden(2, accounting != "disk")
+        self.size_table.setColumnHidden(3, accounting != "disk")
+        self.analyzer = PackageSizeAnalyzer(accounting=accounting)
         self.analyzer.progress.connect(self.update_status)
+        self.analyzer.partial.connect(self.add_partial_results)
         self.analyzer.finished.connect(self.update_charts)
         self.analyzer.start()
+    def stop_analysis(self):
+        self.redraw_timer.stop()
+        if self.analyzer is None:
+            return
+        self.analyzer.cancel()
+        for signal in (self.analyzer.progress, self.analyzer.partial, self.analyzer.finished):
+            try:
+                signal.disconnect()
+            except TypeError:
+                pass
+        self.analyzer.wait()
+        self.analyzer = None
+    def done(self, result):
+        self.stop_analysis()
+        super().done(result)
     def update_status(self, message):
         self.status_label.setText(message)
+    def add_partial_results(self, batch):
+        self.size_data.extend(batch)
+        self.charts_dirty = True
+        if not self.redraw_timer.isActive():
+            self.redraw_charts()
+            self.redraw_timer.start()
+    def redraw_charts(self):
+        if not self.charts_dirty:
+            self.redraw_timer.stop()
+            return
+        self.charts_dirty = False
+        self.size_data.sort(key=lambda x: x.get("size", 0), reverse=True)
+        self.update_pie_chart(self.size_data)
+        self.update_bar_chart(self.size_data)
+        self.update_size_table(self.size_data)
     def update_charts(self, size_data):
+        self.redraw_timer.stop()
+        self.charts_dirty = False
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(100)
         if not size_data:
             self.status_label.setText("Не удалось получить данные о размерах пакетов")
             return
+        self.size_data = size_data
         self.update_pie_chart(size_data)
         self.update_bar_chart(size_data)
         self.update_size_table(size_data)
@@ -1520,7 +1721,7 @@ class PackageSizeChartDialog(QDialog):
         )
         ax.legend(wedges, labels, title="Пакеты", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1))
         ax.axis('equal')
-        self.pie_canvas.draw()
+        self.pie_canvas.draw_idle()
     def update_bar_chart(self, size_data):
         self.bar_figure.clear()
         top_packages = size_data[:20]
@@ -1543,11 +1744,11 @@ class PackageSizeChartDialog(QDialog):
         ax.set_xlabel("Пакет")
         ax.set_ylabel("Размер (МБ)")
         self.bar_figure.tight_layout()
-        self.bar_canvas.draw()
+        self.bar_canvas.draw_idle()
     def update_size_table(self, size_data):
-        self.size_table.setRowCount(0)
+        self.size_table.setUpdatesEnabled(False)
+        self.size_table.setRowCount(len(size_data))
         for i, pkg in enumerate(size_data):
-            self.size_table.insertRow(i)
             name_item = QTableWidgetItem(pkg.get("name", ""))
             name_item.setFlags(name_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
             self.size_table.setItem(i, 0, name_item)
@@ -1555,14 +1756,21 @@ class PackageSizeChartDialog(QDialog):
             size_item = QTableWidgetItem(f"{size_mb:.2f}")
             size_item.setFlags(size_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
             self.size_table.setItem(i, 1, size_item)
+            reclaimable_item = QTableWidgetItem(f"{pkg.get('reclaimable_mb', 0):.2f}")
+            reclaimable_item.setFlags(reclaimable_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+            self.size_table.setItem(i, 2, reclaimable_item)
+            shared_item = QTableWidgetItem(f"{pkg.get('shared_mb', 0):.2f}")
+            shared_item.setFlags(shared_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+            self.size_table.setItem(i, 3, shared_item)
             file_count = pkg.get("file_count", 0)
             files_item = QTableWidgetItem(str(file_count))
             files_item.setFlags(files_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.size_table.setItem(i, 2, files_item)
+            self.size_table.setItem(i, 4, files_item)
             location = pkg.get("location", "")
             location_item = QTableWidgetItem(location)
             location_item.setFlags(location_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
-            self.size_table.setItem(i, 3, location_item)
+            self.size_table.setItem(i, 5, location_item)
+        self.size_table.setUpdatesEnabled(True)
 def main():
     app = QApplication(sys.argv)
     global APP_ICON
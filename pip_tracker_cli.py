@@ -0,0 +1,186 @@
+import sys
+import json
+import argparse
+from pip_tracker_core import (PACKAGE_INVENTORY, BULK_UPDATE_WORKERS, HISTORY_PAGE_SIZE, ENVIRONMENT_WORKERS,
+                              ENVIRONMENTS, find_environment, find_outdated, BulkUpdate, BulkUninstall,
+                              SizeAnalysis, PackageHistoryManager, load_drift_sources, drift_report, fleet_drift)
+def emit(data):
+    json.dump(data, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+def progress_printer(args):
+    if args.quiet:
+        return None
+    def on_progress(message):
+        print(message, file=sys.stderr, flush=True)
+    return on_progress
+def command_list(args):
+    inventory = PACKAGE_INVENTORY
+    if args.python:
+        environment = find_environment(args.python)
+        if environment is None:
+            emit({"error": f"{args.python}: не является известным окружением или интерпретатором"})
+            return 2
+        inventory = ENVIRONMENTS.inventory(environment)
+    try:
+        packages = inventory.packages()
+    except Exception as e:
+        emit({"error": str(e)})
+        return 2
+    emit([{"name": pkg.name, "version": pkg.version, "location": pkg.location} for pkg in packages])
+    return 0
+def command_environments(args):
+    for python in args.add:
+        ENVIRONMENTS.add(python)
+    environments = ENVIRONMENTS.environments()
+    def environment_scanned(environment, error):
+        if not args.quiet:
+            print(f"{environment.name}: {error or 'готово'}", file=sys.stderr, flush=True)
+    errors = ENVIRONMENTS.refresh_all(environments, args.refresh, args.workers, environment_scanned)
+    result = []
+    for environment in environments:
+        entry = {"key": environment.key, "name": environment.name, "python": environment.python}
+        if environment.key in errors:
+            entry["error"] = errors[environment.key]
+        else:
+            entry["packages"] = len(ENVIRONMENTS.inventory(environment).packages())
+        result.append(entry)
+    emit(result)
+    return 1 if errors else 0
+def command_outdated(args):
+    emit(find_outdated(index_url=args.index_url, force=args.refresh))
+    return 0
+def command_drift(args):
+    targets = args.targets or [environment.python for environment in ENVIRONMENTS.environments()
+                               if not environment.is_current]
+    sources = [args.baseline or sys.executable] + targets
+    loaded = load_drift_sources(sources)
+    baseline_label, baseline, error = loaded[0]
+    if error:
+        emit({"error": error})
+        return 2
+    snapshots = {baseline_label: baseline}
+    reports = {}
+    errors = {}
+    for source, (label, versions, error) in zip(sources[1:], loaded[1:]):
+        if error:
+            errors[source] = error
+            continue
+        if label in snapshots:
+            label = source
+        snapshots[label] = versions
+        reports[label] = drift_report(baseline, versions)
+    result = {"baseline": baseline_label, "reports": reports}
+    if len(snapshots) > 2:
+        result["fleet"] = fleet_drift(snapshots)
+    if errors:
+        result["errors"] = errors
+    emit(result)
+    if errors:
+        return 2
+    drifted = any(report[kind] for report in reports.values()
+                  for kind in ("added", "removed", "upgraded", "downgraded", "changed"))
+    return 1 if drifted and args.check else 0
+def command_sizes(args):
+    analysis = SizeAnalysis(args.packages, accounting=args.accounting, on_progress=progress_printer(args))
+    result = analysis.run()
+    emit(result[:args.top] if args.top else result)
+    return 0
+def command_update(args):
+    if args.packages:
+        packages = [{"name": name, "version": PACKAGE_INVENTORY.get_version(name)} for name in args.packages]
+    else:
+        packages = find_outdated(index_url=args.index_url)
+    history_manager = PackageHistoryManager()
+    results = []
+    def package_updated(package_name, success, message, previous_version):
+        history_manager.add_operation("update", package_name, previous_version, success, message)
+        results.append({
+            "name": package_name,
+            "success": success,
+            "previous_version": previous_version,
+            "version": PACKAGE_INVENTORY.get_version(package_name)
+        })
+    BulkUpdate(packages, not args.serial, args.workers, progress_printer(args), package_updated).run()
+    emit(results)
+    return 0 if all(result["success"] for result in results) else 1
+def command_uninstall(args):
+    history_manager = PackageHistoryManager()
+    results = []
+    def package_uninstalled(package_name, success, message, version):
+        history_manager.add_operation("uninstall", package_name, version, success, message)
+        results.append({"name": package_name, "success": success, "version": version, "message": message})
+    BulkUninstall(args.packages, progress_printer(args), package_uninstalled).run()
+    emit(results)
+    return 0 if all(result["success"] for result in results) else 1
+def command_history(args):
+    history_manager = PackageHistoryManager()
+    operations = history_manager.get_operations(args.package, args.type, args.limit, args.offset,
+                                                 prefix=args.prefix, details=False)
+    if args.details:
+        for operation in operations:
+            operation["details"] = history_manager.get_operation_details(operation)
+    emit(operations)
+    return 0
+def command_rollback(args):
+    history_manager = PackageHistoryManager()
+    operation = history_manager.get_operation(args.operation_id)
+    if operation is None:
+        emit({"success": False, "message": f"Операция {args.operation_id} не найдена"})
+        return 1
+    success, message = history_manager.rollback_operation(operation, progress_printer(args))
+    emit({"success": success, "message": message})
+    return 0 if success else 1
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pip_tracker", description="PipTracker без графического интерфейса")
+    parser.add_argument("-q", "--quiet", action="store_true", help="не выводить ход выполнения в stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="установленные пакеты")
+    list_parser.add_argument("--python", help="интерпретатор другого окружения")
+    list_parser.set_defaults(handler=command_list)
+    environments_parser = commands.add_parser("environments", help="окружения Python и число пакетов в них")
+    environments_parser.add_argument("--add", action="append", default=[], metavar="PYTHON",
+                                     help="добавить интерпретатор в список")
+    environments_parser.add_argument("--refresh", action="store_true", help="пересканировать без кэша")
+    environments_parser.add_argument("--workers", type=int, default=ENVIRONMENT_WORKERS)
+    environments_parser.set_defaults(handler=command_environments)
+    outdated_parser = commands.add_parser("outdated", help="пакеты, для которых есть обновления")
+    outdated_parser.add_argument("--index-url")
+    outdated_parser.add_argument("--refresh", action="store_true", help="запросить индекс, не дожидаясь истечения кэша")
+    outdated_parser.set_defaults(handler=command_outdated)
+    drift_parser = commands.add_parser("drift", help="расхождение версий между окружениями и файлами блокировки")
+    drift_parser.add_argument("targets", nargs="*",
+                              help="интерпретаторы, окружения из списка или файлы блокировки (по умолчанию все окружения)")
+    drift_parser.add_argument("--baseline", help="с чем сравнивать (по умолчанию текущее окружение)")
+    drift_parser.add_argument("--check", action="store_true", help="код возврата 1 при любом расхождении (2 — источник не удалось прочитать)")
+    drift_parser.set_defaults(handler=command_drift)
+    sizes_parser = commands.add_parser("sizes", help="размеры пакетов")
+    sizes_parser.add_argument("packages", nargs="*")
+    sizes_parser.add_argument("--accounting", choices=["apparent", "disk"], default="apparent")
+    sizes_parser.add_argument("--top", type=int, default=0)
+    sizes_parser.set_defaults(handler=command_sizes)
+    update_parser = commands.add_parser("update", help="обновить пакеты (по умолчанию все устаревшие)")
+    update_parser.add_argument("packages", nargs="*")
+    update_parser.add_argument("--index-url")
+    update_parser.add_argument("--serial", action="store_true", help="обновлять пакеты по одному")
+    update_parser.add_argument("--workers", type=int, default=BULK_UPDATE_WORKERS)
+    update_parser.set_defaults(handler=command_update)
+    uninstall_parser = commands.add_parser("uninstall", help="удалить пакеты")
+    uninstall_parser.add_argument("packages", nargs="+")
+    uninstall_parser.set_defaults(handler=command_uninstall)
+    history_parser = commands.add_parser("history", help="история операций")
+    history_parser.add_argument("--package")
+    history_parser.add_argument("--type")
+    history_parser.add_argument("--prefix", action="store_true", help="искать пакеты по началу имени")
+    history_parser.add_argument("--limit", type=int, default=HISTORY_PAGE_SIZE)
+    history_parser.add_argument("--offset", type=int, default=0)
+    history_parser.add_argument("--details", action="store_true", help="включить вывод pip")
+    history_parser.set_defaults(handler=command_history)
+    rollback_parser = commands.add_parser("rollback", help="откатить операцию из истории")
+    rollback_parser.add_argument("operation_id")
+    rollback_parser.set_defaults(handler=command_rollback)
+    return parser
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2196 @@
+import sys
+import os
+import json
+import base64
+import pickle
+import csv
+import gzip
+import hashlib
+import sqlite3
+import re
+import bisect
+import shutil
+import stat
+import queue
+import subprocess
+import tempfile
+import uuid
+import threading
+import time
+import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from importlib import metadata as importlib_metadata
+from html.parser import HTMLParser
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlparse, unquote
+try:
+    from packaging.requirements import Requirement
+    from packaging.specifiers import SpecifierSet
+    from packaging.version import Version, InvalidVersion
+except ImportError:
+    from pip._vendor.packaging.requirements import Requirement
+    from pip._vendor.packaging.specifiers import SpecifierSet
+    from pip._vendor.packaging.version import Version, InvalidVersion
+BULK_UPDATE_WORKERS = 4
+SIZE_ANALYSIS_WORKERS = 8
+ENVIRONMENT_WORKERS = 8
+PIP_TIMEOUT = 1800
+PIP_QUERY_TIMEOUT = 300
+OUTPUT_FLUSH_INTERVAL = 0.2
+OUTPUT_MAX_LINES = 200
+HISTORY_BACKEND = os.environ.get("PIPTRACKER_HISTORY_BACKEND", "journal")
+HISTORY_PAGE_SIZE = 200
+HISTORY_INLINE_DETAILS = 512
+HISTORY_FORMAT_VERSION = 1
+HISTORY_LOG_MAX_AGE = 180 * 24 * 60 * 60
+HISTORY_LOG_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_INDEX_URL = "https://pypi.org/simple/"
+INDEX_TIMEOUT = 15
+INDEX_CONCURRENCY = 16
+OUTDATED_CACHE_TTL = 6 * 60 * 60
+CATALOG_SEARCH_FIELDS = ("name", "install_name", "category", "support")
+CATALOG_FUZZY_THRESHOLD = 0.5
+CATALOG_CACHE_ENTRIES = 4
+CURRENT_PYTHON_VERSION = ".".join(str(part) for part in sys.version_info[:3])
+CACHE_DIR = os.environ.get("PIPTRACKER_CACHE_DIR") or os.path.join(
+    os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache"), "PipTracker")
+def canonicalize_name(name):
+    return re.sub(r"[-_.]+", "-", name or "").lower()
+class InstalledDistribution:
+    def __init__(self, distribution, location):
+        self.distribution = distribution
+        metadata = distribution.metadata
+        self.name = metadata["Name"] or ""
+        self.key = canonicalize_name(self.name)
+        self.version = metadata["Version"] or ""
+        self.location = location
+        self.path = str(getattr(distribution, "_path", "") or "")
+class PackageInventory:
+    def __init__(self, paths=None):
+        self.paths = paths
+        self._directories = {}
+        self._index = {}
+        self._lock = threading.RLock()
+    def search_paths(self):
+        paths = []
+        for path in (self.paths if self.paths is not None else sys.path):
+            path = os.path.abspath(path or os.curdir)
+            if path not in paths and os.path.isdir(path):
+                paths.append(path)
+        return paths
+    def _scan_directory(self, path):
+        entries = {}
+        for dist in importlib_metadata.distributions(path=[path]):
+            try:
+                entry = InstalledDistribution(dist, path)
+            except Exception:
+                continue
+            if entry.key and entry.key not in entries:
+                entries[entry.key] = entry
+        return entries
+    def refresh(self, force=False):
+        with self._lock:
+            paths = self.search_paths()
+            changed = force or list(self._directories) != paths
+            directories = {}
+            for path in paths:
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                cached = self._directories.get(path)
+                if not force and cached and cached[0] == mtime:
+                    directories[path] = cached
+                    continue
+                directories[path] = (mtime, self._scan_directory(path))
+                changed = True
+            self._directories = directories
+            if changed:
+                index = {}
+                for mtime, entries in directories.values():
+                    for key, entry in entries.items():
+                        index.setdefault(key, entry)
+                self._index = index
+            return self._index
+    def get(self, name):
+        return self.refresh().get(canonicalize_name(name))
+    def get_version(self, name):
+        entry = self.get(name)
+        return entry.version if entry else None
+    def packages(self):
+        return sorted(self.refresh().values(), key=lambda entry: entry.key)
+    def snapshot(self):
+        return {key: (entry.version, entry.path) for key, entry in self.refresh().items()}
+    def __contains__(self, name):
+        return self.get(name) is not None
+PACKAGE_INVENTORY = PackageInventory()
+class DependencyGraph:
+    def __init__(self, inventory):
+        self.inventory = inventory
+        self.requirements = {}
+        self.requires = {}
+        self.required_by = {}
+        self.active_extras = {}
+        self._snapshot = None
+        self._lock = threading.RLock()
+    def parse_requirements(self, entry):
+        requirements = []
+        for line in entry.distribution.requires or []:
+            try:
+                requirements.append(Requirement(line))
+            except Exception:
+                continue
+        return requirements
+    def requirement_applies(self, requirement, extras):
+        if not requirement.marker:
+            return True
+        try:
+            return any(requirement.marker.evaluate({"extra": extra}) for extra in [""] + sorted(extras))
+        except Exception:
+            return False
+    def refresh(self):
+        with self._lock:
+            snapshot = self.inventory.snapshot()
+            if snapshot == self._snapshot:
+                return
+            index = self.inventory.refresh()
+            added, removed, changed = diff_snapshots(self._snapshot or {}, snapshot)
+            for key in removed:
+                self.requirements.pop(key, None)
+            for key in added + changed:
+                if key in index:
+                    self.requirements[key] = self.parse_requirements(index[key])
+            self.rebuild_edges()
+            self._snapshot = snapshot
+    def rebuild_edges(self):
+        active_extras = {key: set() for key in self.requirements}
+        requires = {}
+        pending = list(self.requirements)
+        while pending:
+            key = pending.pop()
+            dependencies = {}
+            for requirement in self.requirements[key]:
+                if not self.requirement_applies(requirement, active_extras[key]):
+                    continue
+                dependency = canonicalize_name(requirement.name)
+                dependencies.setdefault(dependency, requirement.name)
+                if dependency in active_extras:
+                    extras = set(canonicalize_name(extra) for extra in requirement.extras) - active_extras[dependency]
+                    if extras:
+                        active_extras[dependency] |= extras
+                        pending.append(dependency)
+            requires[key] = dependencies
+        required_by = {key: set() for key in requires}
+        for key, dependencies in requires.items():
+            for dependency in dependencies:
+                if dependency in required_by and dependency != key:
+                    required_by[dependency].add(key)
+        self.requires = requires
+        self.required_by = required_by
+        self.active_extras = active_extras
+    def dependencies(self, name):
+        with self._lock:
+            self.refresh()
+            return sorted(self.requires.get(canonicalize_name(name), {}))
+    def dependents(self, name):
+        with self._lock:
+            self.refresh()
+            return sorted(self.required_by.get(canonicalize_name(name), ()))
+    def removal_blockers(self, names):
+        with self._lock:
+            self.refresh()
+            selection = set(canonicalize_name(name) for name in names)
+            blocked = {}
+            changed = True
+            while changed:
+                changed = False
+                for key in sorted(selection):
+                    outside = sorted(dependent for dependent in self.required_by.get(key, ()) if dependent not in selection)
+                    if outside:
+                        blocked[key] = outside
+                        selection.discard(key)
+                        changed = True
+            return selection, blocked
+    def package_details(self, name):
+        with self._lock:
+            self.refresh()
+            index = self.inventory.refresh()
+            entry = index.get(canonicalize_name(name))
+            if entry is None:
+                return None
+            requires = sorted(self.requires.get(entry.key, {}).values(), key=str.lower)
+            required_by = [index[key].name for key in sorted(self.required_by.get(entry.key, ())) if key in index]
+        metadata = entry.distribution.metadata
+        home_page = metadata.get("Home-page") or ""
+        if not home_page:
+            for project_url in metadata.get_all("Project-URL") or []:
+                label, _, url = project_url.partition(",")
+                if canonicalize_name(label.strip()) in ("homepage", "home", "home-page", "source"):
+                    home_page = url.strip()
+                    break
+        return {
+            "name": entry.name,
+            "version": entry.version,
+            "summary": metadata.get("Summary") or "",
+            "author": metadata.get("Author") or "",
+            "author_email": metadata.get("Author-email") or "",
+            "license": metadata.get("License") or "",
+            "home_page": home_page,
+            "location": entry.location,
+            "requires": requires,
+            "required_by": required_by,
+            "metadata": {key.strip(): str(value).strip() for key, value in metadata.items()}
+        }
+def diff_snapshots(old, new):
+    added = [key for key in new if key not in old]
+    removed = [key for key in old if key not in new]
+    changed = [key for key in new if key in old and old[key] != new[key]]
+    return added, removed, changed
+def distribution_files(pkg):
+    base = os.path.dirname(pkg.path) if pkg.path else pkg.location
+    if pkg.path.endswith(".dist-info"):
+        try:
+            record = pkg.distribution.read_text("RECORD")
+        except Exception:
+            record = None
+        if record:
+            files = []
+            for row in csv.reader(record.splitlines()):
+                if not row or not row[0]:
+                    continue
+                size = int(row[2]) if len(row) > 2 and row[2].isdigit() else None
+                files.append((os.path.normpath(os.path.join(base, row[0])), size))
+            return files
+    try:
+        return [(os.path.normpath(str(file.locate())), file.size) for file in pkg.distribution.files or []]
+    except Exception:
+        return []
+def scan_directory_sizes(directory, names):
+    sizes = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name not in names:
+                    continue
+                try:
+                    if entry.is_file():
+                        sizes[entry.path] = entry.stat().st_size
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return sizes
+def measure_distribution(pkg, files=None):
+    if files is None:
+        files = distribution_files(pkg)
+    total_size = 0
+    unsized = {}
+    for path, size in files:
+        if size is None:
+            unsized.setdefault(os.path.dirname(path), set()).add(os.path.basename(path))
+        else:
+            total_size += size
+    for directory, names in unsized.items():
+        total_size += sum(scan_directory_sizes(directory, names).values())
+    return {
+        "name": pkg.key,
+        "size": total_size,
+        "size_mb": round(total_size / (1024 * 1024), 2),
+        "file_count": len(files),
+        "location": pkg.location
+    }
+def bytecode_files(paths):
+    recorded = set(paths)
+    modules = {}
+    for path in paths:
+        if path.endswith(".py"):
+            directory, name = os.path.split(path)
+            modules.setdefault(os.path.join(directory, "__pycache__"), set()).add(name[:-3])
+    extra = []
+    for cache_dir, stems in modules.items():
+        try:
+            with os.scandir(cache_dir) as entries:
+                for entry in entries:
+                    if (entry.name.endswith(".pyc") and entry.name.split(".", 1)[0] in stems
+                            and entry.path not in recorded):
+                        extra.append(entry.path)
+        except OSError:
+            continue
+    return extra
+def distribution_inodes(paths):
+    inodes = {}
+    for path in paths + bytecode_files(paths):
+        try:
+            file_stat = os.lstat(path)
+        except OSError:
+            continue
+        if not stat.S_ISREG(file_stat.st_mode):
+            continue
+        key = (file_stat.st_dev, file_stat.st_ino)
+        if key in inodes:
+            inodes[key][3] += 1
+            continue
+        blocks = getattr(file_stat, "st_blocks", None)
+        disk_size = file_stat.st_size if blocks is None else blocks * 512
+        inodes[key] = [disk_size, file_stat.st_nlink, file_stat.st_size, 1]
+    return inodes
+def measure_disk_usage(pkg):
+    files = distribution_files(pkg)
+    size_info = measure_distribution(pkg, files)
+    inodes = distribution_inodes(list(dict.fromkeys(path for path, _ in files)))
+    disk_size = sum(entry[0] for entry in inodes.values())
+    size_info.update({
+        "apparent_size": size_info["size"],
+        "disk_size": disk_size,
+        "size": disk_size,
+        "size_mb": round(disk_size / (1024 * 1024), 2)
+    })
+    return size_info, inodes
+def account_disk_usage(measurements):
+    owners = {}
+    for _, inodes in measurements:
+        for key in inodes:
+            owners[key] = owners.get(key, 0) + 1
+    result = []
+    for size_info, inodes in measurements:
+        attributed_size = 0
+        shared_size = 0
+        reclaimable_size = 0
+        for key, (disk_size, links, _, references) in inodes.items():
+            holders = owners[key]
+            attributed_size += disk_size / holders
+            if holders > 1:
+                shared_size += disk_size
+            elif references >= links:
+                reclaimable_size += disk_size
+        attributed_size = int(attributed_size)
+        result.append(dict(
+            size_info,
+            size=attributed_size,
+            size_mb=round(attributed_size / (1024 * 1024), 2),
+            shared_size=shared_size,
+            shared_mb=round(shared_size / (1024 * 1024), 2),
+            reclaimable_size=reclaimable_size,
+            reclaimable_mb=round(reclaimable_size / (1024 * 1024), 2)
+        ))
+    return result
+class SizeCache:
+    IDENTITY_FILES = ("RECORD", "installed-files.txt")
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file or os.path.join(CACHE_DIR, "size_cache.json")
+        self._entries = None
+        self._lock = threading.RLock()
+    def entries(self):
+        with self._lock:
+            if self._entries is None:
+                try:
+                    with open(self.cache_file, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f).get("entries", {})
+                except Exception:
+                    self._entries = {}
+            return self._entries
+    def identity(self, pkg):
+        for name in self.IDENTITY_FILES:
+            try:
+                return [pkg.key, pkg.version, pkg.path, os.stat(os.path.join(pkg.path, name)).st_mtime_ns]
+            except OSError:
+                continue
+        try:
+            return [pkg.key, pkg.version, pkg.path, os.stat(pkg.path).st_mtime_ns]
+        except OSError:
+            return None
+    def get(self, pkg):
+        entry = self.entries().get(pkg.path)
+        if entry is None or entry.get("identity") != self.identity(pkg):
+            return None
+        return dict(entry.get("size", {}))
+    def set(self, pkg, size_info):
+        with self._lock:
+            self.entries()[pkg.path] = {"identity": self.identity(pkg), "size": size_info}
+    def prune(self, packages):
+        paths = {pkg.path for pkg in packages}
+        with self._lock:
+            entries = self.entries()
+            for path in [path for path in entries if path not in paths]:
+                del entries[path]
+    def package_size(self, pkg):
+        size_info = self.get(pkg)
+        if size_info is None:
+            size_info = measure_distribution(pkg)
+            self.set(pkg, size_info)
+            self.save()
+        return size_info
+    def save(self):
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+                temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump({"entries": self.entries()}, f, ensure_ascii=False)
+                os.replace(temp_file, self.cache_file)
+            except Exception as e:
+                print(f"Ошибка при сохранении кэша размеров: {e}")
+SIZE_CACHE = SizeCache()
+def package_size(name):
+    pkg = PACKAGE_INVENTORY.get(name)
+    if pkg is None:
+        return None
+    return SIZE_CACHE.package_size(pkg)
+class CommandResult:
+    def __init__(self, returncode, stdout="", stderr="", cancelled=False, timed_out=False, timeout=None):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.cancelled = cancelled
+        self.timed_out = timed_out
+        self.timeout = timeout
+    @property
+    def success(self):
+        return self.returncode == 0 and not self.cancelled and not self.timed_out
+    @property
+    def error(self):
+        if self.cancelled:
+            return "Операция отменена"
+        if self.timed_out:
+            return f"Превышено время ожидания ({self.timeout} с)"
+        return self.stderr
+def _read_stream(stream, name, lines):
+    try:
+        for line in iter(stream.readline, ""):
+            lines.put((name, line))
+    finally:
+        stream.close()
+        lines.put((name, None))
+def run_command(cmd, on_output=None, cancel_event=None, timeout=None,
+                flush_interval=OUTPUT_FLUSH_INTERVAL, max_lines=OUTPUT_MAX_LINES):
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        bufsize=1
+    )
+    lines = queue.Queue()
+    for stream, name in ((process.stdout, "stdout"), (process.stderr, "stderr")):
+        threading.Thread(target=_read_stream, args=(stream, name, lines), daemon=True).start()
+    output = {"stdout": [], "stderr": []}
+    pending = deque(maxlen=max_lines)
+    skipped = 0
+    open_streams = 2
+    started = time.monotonic()
+    last_flush = started
+    stopped_at = None
+    cancelled = timed_out = False
+    while open_streams:
+        try:
+            name, line = lines.get(timeout=0.05)
+            if line is None:
+                open_streams -= 1
+            else:
+                output[name].append(line)
+                if on_output:
+                    if len(pending) == max_lines:
+                        skipped += 1
+                    pending.append(line.rstrip("\n"))
+        except queue.Empty:
+            pass
+        now = time.monotonic()
+        if stopped_at is None:
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+            elif timeout and now - started >= timeout:
+                timed_out = True
+            if cancelled or timed_out:
+                stopped_at = now
+                process.terminate()
+        elif now - stopped_at >= 5:
+            process.kill()
+            if now - stopped_at >= 10:
+                break
+        if on_output and (pending or skipped) and (now - last_flush >= flush_interval or not open_streams):
+            note = [f"... пропущено строк: {skipped}"] if skipped else []
+            on_output("\n".join(note + list(pending)))
+            pending.clear()
+            skipped = 0
+            last_flush = now
+    returncode = process.wait()
+    return CommandResult(returncode, "".join(output["stdout"]), "".join(output["stderr"]),
+                         cancelled, timed_out, timeout)
+def pip_command(*args, python=None):
+    return [python or sys.executable, "-m", "pip", *args]
+ENVIRONMENT_PROBE = r"""
+import json, os, re, sys
+from importlib import metadata
+paths = []
+for path in sys.path[1:]:
+    path = os.path.abspath(path or os.curdir)
+    if path not in paths and os.path.isdir(path):
+        paths.append(path)
+packages = {}
+for dist in metadata.distributions(path=paths):
+    try:
+        name = dist.metadata["Name"] or ""
+        version = dist.metadata["Version"] or ""
+    except Exception:
+        continue
+    key = re.sub(r"[-_.]+", "-", name).lower()
+    if key and key not in packages:
+        path = str(getattr(dist, "_path", "") or "")
+        packages[key] = {"name": name, "version": version, "path": path, "location": os.path.dirname(path)}
+print(json.dumps({
+    "python": sys.executable,
+    "version": sys.version.split()[0],
+    "paths": {path: os.stat(path).st_mtime_ns for path in paths},
+    "packages": list(packages.values())
+}))
+"""
+class PythonEnvironment:
+    def __init__(self, python, name=None):
+        self.python = os.path.abspath(python)
+        self.key = hashlib.sha256(os.path.normcase(self.python).encode("utf-8")).hexdigest()[:16]
+        self.name = name or self.default_name()
+    def default_name(self):
+        directory = os.path.dirname(self.python)
+        if os.path.basename(directory).lower() in ("bin", "scripts"):
+            return os.path.basename(os.path.dirname(directory))
+        return self.python
+    @property
+    def is_current(self):
+        return os.path.normcase(self.python) == os.path.normcase(os.path.abspath(sys.executable))
+    def to_dict(self):
+        return {"python": self.python, "name": self.name}
+class EnvironmentDistribution:
+    def __init__(self, info):
+        self.name = info.get("name", "")
+        self.key = canonicalize_name(self.name)
+        self.version = info.get("version", "")
+        self.location = info.get("location", "")
+        self.path = info.get("path", "")
+class EnvironmentInventory(PackageInventory):
+    def __init__(self, environment, cache_file=None):
+        super().__init__()
+        self.environment = environment
+        self.cache_file = cache_file or os.path.join(CACHE_DIR, "environments", f"{environment.key}.json")
+        self._data = None
+    def load_cache(self):
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            return None
+        return data if data.get("python") == self.environment.python else None
+    def save_cache(self, data):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.cache_file)
+        except Exception as e:
+            print(f"Ошибка при сохранении кэша окружения: {e}")
+    def is_current(self, data):
+        if not data.get("paths"):
+            return False
+        for path, mtime in data["paths"].items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+    def probe(self):
+        result = run_command([self.environment.python, "-c", ENVIRONMENT_PROBE], timeout=PIP_QUERY_TIMEOUT)
+        if not result.success:
+            raise RuntimeError(result.error or f"Не удалось запустить {self.environment.python}")
+        data = json.loads(result.stdout)
+        data["python"] = self.environment.python
+        data["scanned_at"] = time.time()
+        return data
+    @property
+    def python_version(self):
+        return (self._data or {}).get("version")
+    def set_data(self, data):
+        self._data = data
+        index = {}
+        for info in data.get("packages", []):
+            entry = EnvironmentDistribution(info)
+            if entry.key:
+                index.setdefault(entry.key, entry)
+        self._index = index
+    def cached(self):
+        with self._lock:
+            if self._data is None:
+                data = self.load_cache()
+                if data is not None:
+                    self.set_data(data)
+            return self._index if self._data is not None else None
+    def refresh(self, force=False):
+        with self._lock:
+            self.cached()
+            if force or self._data is None or not self.is_current(self._data):
+                data = self.probe()
+                self.save_cache(data)
+                self.set_data(data)
+            return self._index
+class EnvironmentRegistry:
+    def __init__(self, registry_file=None):
+        self.registry_file = registry_file or os.path.join(CACHE_DIR, "environments.json")
+        self._environments = None
+        self._inventories = {}
+        self._lock = threading.RLock()
+    def saved(self):
+        with self._lock:
+            if self._environments is None:
+                try:
+                    with open(self.registry_file, "r", encoding="utf-8") as f:
+                        entries = json.load(f).get("environments", [])
+                    self._environments = [PythonEnvironment(entry["python"], entry.get("name")) for entry in entries]
+                except Exception:
+                    self._environments = []
+            return self._environments
+    def environments(self):
+        environments = {}
+        candidates = [PythonEnvironment(sys.executable, "Текущее окружение")]
+        candidates.extend(PythonEnvironment(python) for python in
+                          os.environ.get("PIPTRACKER_ENVIRONMENTS", "").split(os.pathsep) if python)
+        candidates.extend(self.saved())
+        for environment in candidates:
+            environments.setdefault(environment.key, environment)
+        return list(environments.values())
+    def get(self, key):
+        for environment in self.environments():
+            if environment.key == key:
+                return environment
+        return None
+    def add(self, python, name=None):
+        environment = PythonEnvironment(python, name)
+        with self._lock:
+            saved = [entry for entry in self.saved() if entry.key != environment.key]
+            saved.append(environment)
+            self._environments = saved
+            self.save()
+        return environment
+    def remove(self, key):
+        with self._lock:
+            self._environments = [entry for entry in self.saved() if entry.key != key]
+            self._inventories.pop(key, None)
+            self.save()
+    def save(self):
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.registry_file), exist_ok=True)
+                temp_file = f"{self.registry_file}.{os.getpid()}.tmp"
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump({"environments": [entry.to_dict() for entry in self.saved()]}, f, ensure_ascii=False)
+                os.replace(temp_file, self.registry_file)
+            except Exception as e:
+                print(f"Ошибка при сохранении списка окружений: {e}")
+    def inventory(self, environment):
+        if environment.is_current:
+            return PACKAGE_INVENTORY
+        with self._lock:
+            inventory = self._inventories.get(environment.key)
+            if inventory is None:
+                inventory = self._inventories[environment.key] = EnvironmentInventory(environment)
+            return inventory
+    def refresh_all(self, environments=None, force=False, max_workers=ENVIRONMENT_WORKERS,
+                    on_environment=None, cancel_event=None):
+        on_environment = on_environment or (lambda environment, error: None)
+        environments = environments or self.environments()
+        def refresh(environment):
+            if cancel_event is not None and cancel_event.is_set():
+                return "Операция отменена"
+            try:
+                self.inventory(environment).refresh(force)
+            except Exception as e:
+                return str(e)
+            return None
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(refresh, environment): environment for environment in environments}
+            for future in as_completed(futures):
+                environment = futures[future]
+                error = future.result()
+                if error:
+                    errors[environment.key] = error
+                on_environment(environment, error)
+        return errors
+ENVIRONMENTS = EnvironmentRegistry()
+LOCKFILE_SUFFIXES = (".txt", ".in", ".lock", ".json", ".toml")
+def inventory_versions(inventory):
+    return {key: {"name": entry.name, "version": entry.version} for key, entry in inventory.refresh().items()}
+def parse_requirements_lock(text):
+    versions = {}
+    for line in text.replace("\\\n", " ").splitlines():
+        line = line.split(" #", 1)[0].strip()
+        if not line or line.startswith(("#", "-")):
+            continue
+        line = line.split(" --hash", 1)[0].strip()
+        try:
+            requirement = Requirement(line)
+        except Exception:
+            continue
+        version = None
+        for specifier in requirement.specifier:
+            if specifier.operator in ("==", "==="):
+                version = specifier.version
+        versions.setdefault(canonicalize_name(requirement.name), {"name": requirement.name, "version": version})
+    return versions
+def read_lockfile(path):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.endswith(".json"):
+        data = json.loads(text)
+        entries = data.get("packages", []) if isinstance(data, dict) else data
+    elif path.endswith((".toml", ".lock")):
+        try:
+            import tomllib
+            data = tomllib.loads(text)
+        except Exception:
+            return parse_requirements_lock(text)
+        entries = data.get("packages") or data.get("package") or []
+    else:
+        return parse_requirements_lock(text)
+    versions = {}
+    for entry in entries:
+        name = entry.get("name", "")
+        if name:
+            versions.setdefault(canonicalize_name(name), {"name": name, "version": entry.get("version")})
+    return versions
+def find_environment(source):
+    for environment in ENVIRONMENTS.environments():
+        if source in (environment.key, environment.name, environment.python):
+            return environment
+    if os.path.isfile(source) and os.access(source, os.X_OK) and not source.lower().endswith(LOCKFILE_SUFFIXES):
+        return PythonEnvironment(source)
+    return None
+def drift_source_versions(source):
+    environment = find_environment(source)
+    if environment is not None:
+        return environment.name, inventory_versions(ENVIRONMENTS.inventory(environment))
+    if os.path.isfile(source):
+        return os.path.basename(source), read_lockfile(source)
+    raise ValueError(f"{source}: не является известным окружением, интерпретатором или файлом блокировки")
+def load_drift_source(source):
+    try:
+        label, versions = drift_source_versions(source)
+        return label, versions, None
+    except Exception as e:
+        return source, None, str(e)
+def load_drift_sources(sources, max_workers=ENVIRONMENT_WORKERS):
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(load_drift_source, sources))
+def drift_report(baseline, target):
+    report = {"added": [], "removed": [], "upgraded": [], "downgraded": [], "changed": [], "unchanged": 0}
+    for key, entry in target.items():
+        base = baseline.get(key)
+        if base is None:
+            report["added"].append({"name": entry["name"], "version": entry["version"]})
+            continue
+        if base["version"] == entry["version"] or not base["version"] or not entry["version"]:
+            report["unchanged"] += 1
+            continue
+        old, new = parse_version(base["version"]), parse_version(entry["version"])
+        change = {"name": entry["name"], "from": base["version"], "to": entry["version"]}
+        if old is None or new is None:
+            report["changed"].append(change)
+        elif new > old:
+            report["upgraded"].append(change)
+        elif new < old:
+            report["downgraded"].append(change)
+        else:
+            report["unchanged"] += 1
+    report["removed"] = [{"name": base["name"], "version": base["version"]}
+                         for key, base in baseline.items() if key not in target]
+    for kind in ("added", "removed", "upgraded", "downgraded", "changed"):
+        report[kind].sort(key=lambda item: canonicalize_name(item["name"]))
+    return report
+def fleet_drift(snapshots):
+    table = {}
+    for label, versions in snapshots.items():
+        for key, entry in versions.items():
+            row = table.get(key)
+            if row is None:
+                row = table[key] = {"name": entry["name"], "versions": {}}
+            row["versions"][label] = entry["version"]
+    labels = list(snapshots)
+    drift = []
+    for key in sorted(table):
+        row = table[key]
+        versions = [row["versions"].get(label) for label in labels]
+        if len(set(versions)) > 1:
+            row["versions"] = dict(zip(labels, versions))
+            drift.append(row)
+    return drift
+DEPENDENCY_GRAPH = DependencyGraph(PACKAGE_INVENTORY)
+_pip_config = {}
+def pip_config_value(name, environment_variable):
+    if name not in _pip_config:
+        value = os.environ.get(environment_variable, "")
+        if not value:
+            try:
+                result = run_command(pip_command("config", "get", f"global.{name}"), timeout=INDEX_TIMEOUT)
+                if result.success:
+                    value = result.stdout.strip()
+            except Exception:
+                pass
+        _pip_config[name] = value
+    return _pip_config[name]
+def get_index_url():
+    return (pip_config_value("index-url", "PIP_INDEX_URL") or DEFAULT_INDEX_URL).rstrip("/") + "/"
+def index_ssl_context():
+    import ssl
+    cafile = (pip_config_value("cert", "PIP_CERT") or os.environ.get("REQUESTS_CA_BUNDLE")
+              or os.environ.get("SSL_CERT_FILE") or None)
+    return ssl.create_default_context(cafile=cafile)
+def split_index_credentials(url):
+    parsed = urlparse(url)
+    if parsed.username is None:
+        return url, None
+    credentials = f"{unquote(parsed.username)}:{unquote(parsed.password or '')}"
+    authorization = "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+    netloc = parsed.netloc.rsplit("@", 1)[-1]
+    return parsed._replace(netloc=netloc).geturl(), authorization
+def parse_version(version):
+    try:
+        return Version(version)
+    except (InvalidVersion, TypeError):
+        return None
+def version_from_filename(filename):
+    if filename.endswith(".whl") or filename.endswith(".egg"):
+        parts = filename.split("-")
+        return parts[1] if len(parts) > 2 else None
+    for extension in (".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".zip", ".tar"):
+        if filename.endswith(extension):
+            parts = filename[:-len(extension)].rsplit("-", 1)
+            return parts[1] if len(parts) == 2 else None
+    return None
+def parse_simple_json(data):
+    versions = set()
+    for file_info in data.get("files", []):
+        version = version_from_filename(file_info.get("filename", ""))
+        if version and not file_info.get("yanked"):
+            versions.add((version, file_info.get("requires-python") or ""))
+    return sorted(versions)
+class SimpleIndexHTMLParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.versions = []
+        self._anchor = None
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._anchor = dict(attrs)
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self._anchor = None
+    def handle_data(self, data):
+        if self._anchor is None or "data-yanked" in self._anchor:
+            return
+        href = self._anchor.get("href", "").split("#", 1)[0]
+        filename = data.strip() or href.rstrip("/").rsplit("/", 1)[-1]
+        version = version_from_filename(filename)
+        if version:
+            self.versions.append((version, self._anchor.get("data-requires-python") or ""))
+def parse_simple_html(text):
+    parser = SimpleIndexHTMLParser()
+    parser.feed(text)
+    return parser.versions
+def parse_simple_response(body, content_type):
+    if "json" in (content_type or ""):
+        return parse_simple_json(json.loads(body))
+    return parse_simple_html(body)
+def python_version_supported(requires_python, python_version):
+    if not requires_python:
+        return True
+    try:
+        return SpecifierSet(requires_python).contains(python_version, prereleases=True)
+    except Exception:
+        return True
+def select_latest_version(versions, current_version=None, python_version=None):
+    current = parse_version(current_version)
+    allow_prereleases = current is not None and current.is_prerelease
+    python_version = python_version or CURRENT_PYTHON_VERSION
+    best = None
+    for version, requires_python in versions:
+        parsed = parse_version(version)
+        if parsed is None or (parsed.is_prerelease and not allow_prereleases):
+            continue
+        if not python_version_supported(requires_python, python_version):
+            continue
+        if best is None or parsed > best[0]:
+            best = (parsed, version)
+    return best[1] if best else None
+class IndexResponse:
+    def __init__(self, status, versions=None, etag=None, last_modified=None):
+        self.status = status
+        self.versions = versions or []
+        self.etag = etag
+        self.last_modified = last_modified
+class SimpleIndexClient:
+    ACCEPT = "application/vnd.pypi.simple.v1+json, application/vnd.pypi.simple.v1+html;q=0.2, text/html;q=0.1"
+    def __init__(self, index_url=None, timeout=INDEX_TIMEOUT):
+        index_url, self.authorization = split_index_credentials((index_url or get_index_url()).rstrip("/") + "/")
+        self.index_url = index_url
+        self.timeout = timeout
+        self._ssl_context = None
+    def project_url(self, name):
+        return urljoin(self.index_url, canonicalize_name(name) + "/")
+    def ssl_context(self):
+        if self._ssl_context is None:
+            self._ssl_context = index_ssl_context()
+        return self._ssl_context
+    def request_headers(self, url, etag=None, last_modified=None):
+        headers = {"Accept": self.ACCEPT}
+        if self.authorization and urlparse(url).netloc == urlparse(self.index_url).netloc:
+            headers["Authorization"] = self.authorization
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+    def fetch(self, name, etag=None, last_modified=None):
+        url = self.project_url(name)
+        if urlparse(url).scheme == "file":
+            return self.fetch_file(url, last_modified)
+        headers = self.request_headers(url, etag, last_modified)
+        from urllib.request import Request, urlopen
+        try:
+            context = self.ssl_context() if urlparse(url).scheme == "https" else None
+            with urlopen(Request(url, headers=headers), timeout=self.timeout, context=context) as response:
+                body = response.read().decode("utf-8", "replace")
+                return IndexResponse(
+                    response.status,
+                    parse_simple_response(body, response.headers.get("Content-Type")),
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified")
+                )
+        except HTTPError as e:
+            if e.code == 304:
+                return IndexResponse(304, etag=etag, last_modified=last_modified)
+            if e.code == 404:
+                return IndexResponse(404)
+            raise
+    def fetch_file(self, url, last_modified=None):
+        from urllib.request import url2pathname
+        project_dir = url2pathname(urlparse(url).path)
+        for filename, content_type in (("index.json", "application/json"), ("index.html", "text/html")):
+            path = os.path.join(project_dir, filename)
+            if not os.path.isfile(path):
+                continue
+            modified = str(os.stat(path).st_mtime_ns)
+            if modified == last_modified:
+                return IndexResponse(304, last_modified=modified)
+            with open(path, "r", encoding="utf-8") as f:
+                return IndexResponse(200, parse_simple_response(f.read(), content_type), last_modified=modified)
+        return IndexResponse(404)
+class AsyncIndexClient:
+    def __init__(self, index_url=None, concurrency=INDEX_CONCURRENCY, timeout=INDEX_TIMEOUT):
+        self.sync_client = SimpleIndexClient(index_url, timeout)
+        self.index_url = self.sync_client.index_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._idle = {}
+    async def fetch(self, name, etag=None, last_modified=None):
+        import asyncio
+        from urllib.request import getproxies
+        url = self.sync_client.project_url(name)
+        if urlparse(url).scheme not in ("http", "https") or getproxies():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.sync_client.fetch, name, etag, last_modified)
+        for _ in range(5):
+            headers = self.sync_client.request_headers(url, etag, last_modified)
+            headers["Accept-Encoding"] = "gzip"
+            status, response_headers, body = await self.request(url, headers)
+            if status in (301, 302, 303, 307, 308) and response_headers.get("location"):
+                url = urljoin(url, response_headers["location"])
+                continue
+            break
+        if status == 304:
+            return IndexResponse(304, etag=etag, last_modified=last_modified)
+        if status == 404:
+            return IndexResponse(404)
+        if status >= 400:
+            raise HTTPError(url, status, f"HTTP {status}", None, None)
+        return IndexResponse(
+            status,
+            parse_simple_response(body.decode("utf-8", "replace"), response_headers.get("content-type")),
+            response_headers.get("etag"),
+            response_headers.get("last-modified")
+        )
+    async def request(self, url, headers):
+        import asyncio
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.hostname, parsed.port or (443 if parsed.scheme == "https" else 80))
+        path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+        host = parsed.netloc.rsplit("@", 1)[-1]
+        lines = [f"GET {path} HTTP/1.1", f"Host: {host}", "Connection: keep-alive"]
+        lines.extend(f"{header}: {value}" for header, value in headers.items())
+        payload = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        for attempt in range(2):
+            idle = self._idle.get(key)
+            reused = bool(idle)
+            connection = idle.pop() if idle else await self.connect(key)
+            reader, writer = connection
+            try:
+                writer.write(payload)
+                await writer.drain()
+                status, response_headers, body, keep_alive = await self.read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                writer.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if keep_alive:
+                self._idle.setdefault(key, []).append(connection)
+            else:
+                writer.close()
+            return status, response_headers, body
+    async def connect(self, key):
+        import asyncio
+        scheme, host, port = key
+        context = self.sync_client.ssl_context() if scheme == "https" else None
+        return await asyncio.open_connection(host, port, ssl=context)
+    async def read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("Соединение закрыто сервером")
+        parts = status_line.decode("latin-1").split(None, 2)
+        version, status = parts[0], int(parts[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            header, _, value = line.decode("latin-1").partition(":")
+            headers[header.strip().lower()] = value.strip()
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if status in (204, 304) or status < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip(), 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        if headers.get("content-encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+        return status, headers, body, keep_alive
+    async def fetch_all(self, requests, cancel_event=None):
+        import asyncio
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        async def fetch_one(name, etag, last_modified):
+            async with semaphore:
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                try:
+                    return await asyncio.wait_for(self.fetch(name, etag, last_modified), self.timeout)
+                except Exception as e:
+                    return e
+        try:
+            return await asyncio.gather(*(fetch_one(*request) for request in requests))
+        finally:
+            self.close()
+    def close(self):
+        for connections in self._idle.values():
+            for reader, writer in connections:
+                writer.close()
+        self._idle = {}
+    def fetch_many(self, requests, cancel_event=None):
+        import asyncio
+        return asyncio.run(self.fetch_all(list(requests), cancel_event))
+class OutdatedCache:
+    def __init__(self, cache_file=None, ttl=OUTDATED_CACHE_TTL):
+        self.cache_file = cache_file or os.path.join(CACHE_DIR, "outdated_cache.json")
+        self.ttl = ttl
+        self._entries = None
+        self._lock = threading.RLock()
+    def entries(self):
+        with self._lock:
+            if self._entries is None:
+                try:
+                    with open(self.cache_file, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f).get("entries", {})
+                except Exception:
+                    self._entries = {}
+            return self._entries
+    def key(self, index_url, name):
+        return f"{index_url}|{canonicalize_name(name)}"
+    def get(self, index_url, name):
+        return self.entries().get(self.key(index_url, name))
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry.get("checked_at", 0) < self.ttl
+    def set(self, index_url, name, latest_version, etag=None, last_modified=None):
+        with self._lock:
+            self.entries()[self.key(index_url, name)] = {
+                "latest_version": latest_version,
+                "etag": etag,
+                "last_modified": last_modified,
+                "checked_at": time.time()
+            }
+    def touch(self, index_url, name):
+        with self._lock:
+            entry = self.get(index_url, name)
+            if entry is not None:
+                entry["checked_at"] = time.time()
+    def save(self):
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+                temp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+                with open(temp_file, "w", encoding="utf-8") as f:
+                    json.dump({"entries": self.entries()}, f, ensure_ascii=False)
+                os.replace(temp_file, self.cache_file)
+            except Exception as e:
+                print(f"Ошибка при сохранении кэша обновлений: {e}")
+OUTDATED_CACHE = OutdatedCache()
+class OutdatedChecker:
+    def __init__(self, index_url=None, cache=None, client=None, python_version=None):
+        self.client = client or AsyncIndexClient(index_url)
+        self.index_url = self.client.index_url
+        self.python_version = python_version or CURRENT_PYTHON_VERSION
+        self.cache_scope = f"{self.index_url}|py{self.python_version}"
+        self.cache = cache or OUTDATED_CACHE
+        self.failed = []
+    def outdated_entry(self, pkg, latest_version):
+        latest = parse_version(latest_version)
+        current = parse_version(pkg.version)
+        if latest is None or current is None or latest <= current:
+            return None
+        return {"name": pkg.name, "version": pkg.version, "latest_version": latest_version, "latest_filetype": ""}
+    def cached_outdated(self, packages):
+        outdated = []
+        for pkg in packages:
+            entry = self.cache.get(self.cache_scope, pkg.key)
+            if entry and entry.get("latest_version"):
+                outdated_pkg = self.outdated_entry(pkg, entry["latest_version"])
+                if outdated_pkg:
+                    outdated.append(outdated_pkg)
+        return outdated
+    def stale_requests(self, packages, force=False):
+        stale = []
+        for pkg in packages:
+            entry = self.cache.get(self.cache_scope, pkg.key)
+            if not force and self.cache.is_fresh(entry):
+                continue
+            etag = entry.get("etag") if entry else None
+            last_modified = entry.get("last_modified") if entry else None
+            stale.append((pkg, (pkg.key, etag, last_modified)))
+        return stale
+    def store_response(self, pkg, response):
+        if response.status == 304:
+            self.cache.touch(self.cache_scope, pkg.key)
+        elif response.status == 404:
+            self.cache.set(self.cache_scope, pkg.key, None)
+        else:
+            latest_version = select_latest_version(response.versions, pkg.version, self.python_version)
+            self.cache.set(self.cache_scope, pkg.key, latest_version, response.etag, response.last_modified)
+    def check(self, packages, cancel_event=None, force=False):
+        stale = self.stale_requests(packages, force)
+        errors = []
+        answered = False
+        self.failed = []
+        if stale:
+            responses = self.client.fetch_many([request for pkg, request in stale], cancel_event)
+            for (pkg, request), response in zip(stale, responses):
+                if isinstance(response, IndexResponse):
+                    self.store_response(pkg, response)
+                    answered = True
+                elif isinstance(response, BaseException):
+                    errors.append(response)
+                    self.failed.append(pkg.name)
+        self.cache.save()
+        if errors and not answered:
+            raise errors[0]
+        if self.failed:
+            print(f"Не удалось проверить в индексе: {', '.join(self.failed)} ({errors[0]})")
+        return self.cached_outdated(packages)
+def install_package(package_name, upgrade=False, on_output=None, cancel_event=None):
+    cmd = pip_command("install")
+    if upgrade:
+        cmd.append("--upgrade")
+    cmd.append(package_name)
+    result = run_command(cmd, on_output, cancel_event, PIP_TIMEOUT)
+    if result.success:
+        return True, f"Успешно установлен {package_name}"
+    return False, f"Ошибка: {result.error}"
+def uninstall_package(package_name, on_output=None, cancel_event=None):
+    if package_name not in PACKAGE_INVENTORY:
+        return False, f"Пакет {package_name} не найден"
+    required_by = ", ".join(DEPENDENCY_GRAPH.dependents(package_name))
+    if required_by:
+        return False, f"Внимание! Пакет {package_name} требуется для: {required_by}. Удаление отменено."
+    if on_output:
+        on_output(f"Удаление {package_name}...")
+    result = run_command(pip_command("uninstall", "-y", package_name), on_output, cancel_event, PIP_TIMEOUT)
+    if result.success:
+        return True, f"Успешно удален {package_name}"
+    return False, f"Ошибка при удалении: {result.error}"
+def find_outdated(packages=None, index_url=None, cache=None, on_cached=None, cancel_event=None,
+                  python_version=None, force=False, python=None):
+    try:
+        if packages is None:
+            packages = PACKAGE_INVENTORY.packages()
+        checker = OutdatedChecker(index_url, cache, python_version=python_version)
+        stale = checker.cached_outdated(packages)
+        if stale and on_cached:
+            on_cached(stale)
+        return checker.check(packages, cancel_event, force)
+    except Exception:
+        return pip_list_outdated(cancel_event, python)
+def pip_list_outdated(cancel_event=None, python=None):
+    try:
+        result = run_command(pip_command("list", "--outdated", "--format=json", python=python), None, cancel_event,
+                             PIP_QUERY_TIMEOUT)
+        if result.success:
+            return json.loads(result.stdout)
+    except Exception:
+        pass
+    return []
+class BulkUpdate:
+    def __init__(self, packages, batch=True, max_workers=BULK_UPDATE_WORKERS,
+                 on_progress=None, on_package=None, cancel_event=None):
+        self.packages = packages
+        self.batch = batch
+        self.max_workers = max_workers
+        self.on_progress = on_progress or (lambda message: None)
+        self.on_package = on_package or (lambda name, success, message, previous_version: None)
+        self.cancel_event = cancel_event or threading.Event()
+    def run_pip(self, cmd, stream=True):
+        return run_command(cmd, self.on_progress if stream else None, self.cancel_event, PIP_TIMEOUT)
+    def run(self):
+        packages = [pkg for pkg in self.packages if pkg.get('name', '')]
+        total = len(packages)
+        self.on_progress(f"Начало обновления {total} пакетов...")
+        if self.batch and total > 1:
+            if not self.update_in_batch(packages) and not self.cancel_event.is_set():
+                self.on_progress("Пакетное обновление не удалось, обновление по одному...")
+                self.update_serially(packages)
+        else:
+            self.update_serially(packages)
+        self.on_progress(f"Обновление завершено.")
+    def update_serially(self, packages):
+        total = len(packages)
+        for i, pkg in enumerate(packages):
+            if self.cancel_event.is_set():
+                self.on_progress("Операция отменена")
+                break
+            package_name = pkg.get('name', '')
+            current_version = pkg.get('version', '')
+            self.on_progress(f"[{i+1}/{total}] Обновление {package_name} ({current_version})...")
+            cmd = pip_command("install", "--upgrade", package_name)
+            try:
+                result = self.run_pip(cmd)
+                success = result.success
+                message = result.stdout if success else result.error
+                self.on_progress("Успешно" if success else f"Ошибка: {result.error}")
+                self.on_package(package_name, success, message, current_version)
+            except Exception as e:
+                self.on_progress(f"Ошибка при обновлении {package_name}: {str(e)}")
+                self.on_package(package_name, False, str(e), current_version)
+    def build_wheel(self, package_name, wheel_dir):
+        result = self.run_pip(pip_command("wheel", "--no-deps", "--wheel-dir", wheel_dir, package_name), stream=False)
+        return result.success, result.error
+    def update_in_batch(self, packages):
+        names = [pkg.get('name', '') for pkg in packages]
+        wheel_dir = tempfile.mkdtemp(prefix="piptracker-wheels-")
+        try:
+            self.on_progress(f"Загрузка и сборка {len(names)} пакетов ({self.max_workers} потоков)...")
+            with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+                futures = {executor.submit(self.build_wheel, name, wheel_dir): name for name in names}
+                for i, future in enumerate(as_completed(futures)):
+                    name = futures[future]
+                    try:
+                        built, stderr = future.result()
+                    except Exception as e:
+                        built, stderr = False, str(e)
+                    if built:
+                        self.on_progress(f"[{i+1}/{len(names)}] Загружен {name}")
+                    else:
+                        self.on_progress(f"[{i+1}/{len(names)}] Не удалось заранее загрузить {name}: {stderr}")
+            self.on_progress(f"Установка обновлений одним проходом: {', '.join(names)}...")
+            if self.cancel_event.is_set():
+                self.on_progress("Операция отменена")
+                return False
+            result = self.run_pip(pip_command("install", "--upgrade", "--find-links", wheel_dir, *names))
+        except Exception as e:
+            self.on_progress(f"Ошибка при пакетном обновлении: {str(e)}")
+            return False
+        finally:
+            shutil.rmtree(wheel_dir, ignore_errors=True)
+        if not result.success:
+            self.on_progress(f"Ошибка: {result.error}")
+            return False
+        self.on_progress("Успешно")
+        for pkg in packages:
+            package_name = pkg.get('name', '')
+            current_version = pkg.get('version', '')
+            new_version = PACKAGE_INVENTORY.get_version(package_name)
+            if new_version and new_version != current_version:
+                self.on_package(package_name, True, f"Обновлен {package_name}: {current_version} → {new_version}",
+                                current_version)
+            else:
+                message = f"{package_name} уже последней версии: {new_version or current_version}"
+                details = self.package_output(result.stdout, package_name)
+                self.on_package(package_name, True, f"{message}\n{details}" if details else message, current_version)
+        return True
+    def package_output(self, output, package_name):
+        key = canonicalize_name(package_name)
+        for line in output.splitlines():
+            line = line.strip()
+            for prefix in ("Requirement already satisfied: ", "Requirement already up-to-date: "):
+                if line.startswith(prefix):
+                    name = re.split(r"[\s<>=!~\[;]", line[len(prefix):], 1)[0]
+                    if canonicalize_name(name) == key:
+                        return line
+        return ""
+class BulkUninstall:
+    def __init__(self, package_names, on_progress=None, on_package=None, cancel_event=None):
+        self.package_names = package_names
+        self.on_progress = on_progress or (lambda message: None)
+        self.on_package = on_package or (lambda name, success, message, version: None)
+        self.cancel_event = cancel_event or threading.Event()
+    def run(self):
+        package_names = [name for name in self.package_names if name]
+        total = len(package_names)
+        self.on_progress(f"Начало удаления {total} пакетов...")
+        versions = {}
+        installed = []
+        for package_name in package_names:
+            if package_name not in PACKAGE_INVENTORY:
+                self.on_progress(f"Пропуск {package_name}: пакет не установлен")
+                self.on_package(package_name, False, f"Пакет {package_name} не установлен", None)
+                continue
+            installed.append(package_name)
+            try:
+                versions[package_name] = PACKAGE_INVENTORY.get_version(package_name)
+            except:
+                versions[package_name] = None
+        package_names = installed
+        if not package_names:
+            self.on_progress(f"Удаление завершено.")
+            return
+        self.on_progress("Проверка зависимостей...")
+        try:
+            removable, blocked = DEPENDENCY_GRAPH.removal_blockers(package_names)
+        except Exception as e:
+            self.on_progress(f"Не удалось построить граф зависимостей: {str(e)}")
+            removable, blocked = set(canonicalize_name(name) for name in package_names), {}
+        to_remove = []
+        for package_name in package_names:
+            key = canonicalize_name(package_name)
+            if key in blocked:
+                required_by = ", ".join(blocked[key])
+                self.on_progress(f"Пропуск {package_name}: требуется для {required_by}")
+                self.on_package(package_name, False, f"Пакет требуется для: {required_by}", versions[package_name])
+            elif key in removable:
+                to_remove.append(package_name)
+        if to_remove:
+            for i, package_name in enumerate(to_remove):
+                self.on_progress(f"[{i+1}/{len(to_remove)}] Удаление {package_name} ({versions[package_name] or 'неизвестная версия'})...")
+            try:
+                result = run_command(pip_command("uninstall", "-y", *to_remove), self.on_progress, self.cancel_event, PIP_TIMEOUT)
+                self.on_progress("Успешно" if result.success else f"Ошибка: {result.error}")
+                for package_name in to_remove:
+                    success = package_name not in PACKAGE_INVENTORY
+                    self.on_package(package_name, success, result.stdout if success else (result.error or result.stdout), versions[package_name])
+            except Exception as e:
+                self.on_progress(f"Ошибка при удалении: {str(e)}")
+                for package_name in to_remove:
+                    self.on_package(package_name, False, str(e), versions[package_name])
+        self.on_progress(f"Удаление завершено.")
+class SizeAnalysis:
+    def __init__(self, packages=None, max_workers=SIZE_ANALYSIS_WORKERS, cache=None, accounting="apparent",
+                 on_progress=None, on_partial=None, cancel_event=None):
+        self.packages = packages or []
+        self.max_workers = max_workers
+        self.cache = cache or SIZE_CACHE
+        self.accounting = accounting
+        self.on_progress = on_progress or (lambda message: None)
+        self.on_partial = on_partial or (lambda batch: None)
+        self.cancel_event = cancel_event or threading.Event()
+    def resolve_packages(self):
+        if not self.packages:
+            return PACKAGE_INVENTORY.packages()
+        resolved = []
+        for pkg in self.packages:
+            if isinstance(pkg, dict):
+                pkg = PACKAGE_INVENTORY.get(pkg.get('name', ''))
+            elif isinstance(pkg, str):
+                pkg = PACKAGE_INVENTORY.get(pkg)
+            if pkg is not None:
+                resolved.append(pkg)
+        return resolved
+    def run(self):
+        packages = self.resolve_packages()
+        if self.accounting == "disk":
+            result = self.analyze_disk_usage(packages)
+        else:
+            result = self.analyze_sizes(packages)
+        result.sort(key=lambda x: x.get("size", 0), reverse=True)
+        self.on_progress(f"Анализ завершен.")
+        return result
+    def measure_concurrently(self, packages, measure, on_result):
+        total = len(packages)
+        batch = []
+        last_flush = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = {executor.submit(measure, pkg): pkg for pkg in packages}
+            for i, future in enumerate(as_completed(futures)):
+                if self.cancel_event.is_set():
+                    for pending_future in futures:
+                        pending_future.cancel()
+                    self.on_progress("Операция отменена")
+                    break
+                pkg = futures[future]
+                try:
+                    batch.append(on_result(pkg, future.result()))
+                except Exception as e:
+                    self.on_progress(f"Ошибка при анализе {pkg.key}: {str(e)}")
+                    continue
+                if time.monotonic() - last_flush >= OUTPUT_FLUSH_INTERVAL:
+                    self.on_partial(batch)
+                    self.on_progress(f"[{i+1}/{total}] Проанализирован {pkg.key}")
+                    batch = []
+                    last_flush = time.monotonic()
+        if batch:
+            self.on_partial(batch)
+    def analyze_sizes(self, packages):
+        result = []
+        pending = []
+        for pkg in packages:
+            size_info = self.cache.get(pkg)
+            if size_info is None:
+                pending.append(pkg)
+            else:
+                result.append(size_info)
+        self.on_progress(f"Анализ размеров {len(pending)} пакетов (из кэша: {len(result)})...")
+        if result:
+            self.on_partial(list(result))
+        def store(pkg, size_info):
+            self.cache.set(pkg, size_info)
+            result.append(size_info)
+            return size_info
+        self.measure_concurrently(pending, measure_distribution, store)
+        if not self.packages and not self.cancel_event.is_set():
+            self.cache.prune(packages)
+        self.cache.save()
+        return result
+    def analyze_disk_usage(self, packages):
+        measurements = []
+        self.on_progress(f"Анализ места на диске для {len(packages)} пакетов...")
+        def store(pkg, measurement):
+            measurements.append(measurement)
+            return measurement[0]
+        self.measure_concurrently(packages, measure_disk_usage, store)
+        return account_disk_usage(measurements)
+CATALOG_WORD_SPLIT = re.compile(r"[^0-9a-zа-яё]+")
+def catalog_trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+class CatalogIndex:
+    def __init__(self, libraries):
+        self.libraries = list(libraries)
+        self.suffixes = []
+        self.trigrams = {}
+        for entry, lib in enumerate(self.libraries):
+            for rank, field in enumerate(CATALOG_SEARCH_FIELDS):
+                value = str(lib.get(field) or "").lower()
+                words = set(CATALOG_WORD_SPLIT.split(value)) | {value}
+                words.discard("")
+                for word in words:
+                    for start in range(len(word)):
+                        self.suffixes.append((word[start:], rank, start, entry))
+                    for gram in catalog_trigrams(word):
+                        self.trigrams.setdefault(gram, set()).add(entry)
+        self.suffixes.sort()
+        self.keys = [suffix for suffix, _, _, _ in self.suffixes]
+    def match_term(self, term):
+        scores = {}
+        position = bisect.bisect_left(self.keys, term)
+        while position < len(self.keys) and self.keys[position].startswith(term):
+            suffix, rank, start, entry = self.suffixes[position]
+            score = rank * 3 + (2 if start else 0 if suffix == term else 1)
+            if score < scores.get(entry, score + 1):
+                scores[entry] = score
+            position += 1
+        if scores:
+            return scores
+        grams = catalog_trigrams(term)
+        shared = {}
+        for gram in grams:
+            for entry in self.trigrams.get(gram, ()):
+                shared[entry] = shared.get(entry, 0) + 1
+        for entry, count in shared.items():
+            similarity = count / len(grams)
+            if similarity >= CATALOG_FUZZY_THRESHOLD:
+                scores[entry] = 100 + (1 - similarity)
+        return scores
+    def search(self, query, category=None):
+        terms = [term for term in CATALOG_WORD_SPLIT.split(query.lower()) if term]
+        if not terms:
+            return [lib for lib in self.libraries if category is None or lib.get("category") == category]
+        scores = None
+        for term in terms:
+            term_scores = self.match_term(term)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {entry: score + term_scores[entry] for entry, score in scores.items() if entry in term_scores}
+            if not scores:
+                return []
+        ranked = sorted(
+            (score, -self.libraries[entry].get("activity", 0), self.libraries[entry].get("name", "").lower(), entry)
+            for entry, score in scores.items()
+            if category is None or self.libraries[entry].get("category") == category
+        )
+        return [self.libraries[entry] for _, _, _, entry in ranked]
+SIZE_TRANSLATION = {
+    "light": "легкий",
+    "small": "малый",
+    "medium": "средний",
+    "large": "большой",
+    "very-large": "очень большой",
+    "module": "модуль",
+    "built-in": "встроенный"
+}
+SUPPORT_TRANSLATION = {
+    "built-in": "встроенная",
+    "powerful": "мощная",
+    "active": "активная",
+    "stable": "стабильная",
+    "gpu": "GPU",
+    "standard": "стандартная",
+    "good": "хорошая",
+    "interactive": "интерактивная",
+    "declarative": "декларативная",
+    "popular": "популярная",
+    "modern": "современная",
+    "async": "асинхронная",
+    "micro": "микро",
+    "low-level": "низкоуровневая",
+    "basic": "базовая",
+    "fast": "быстрая",
+    "excel": "Excel",
+    "yaml": "YAML",
+    "convenient": "удобная",
+    "advanced": "продвинутая",
+    "distributed": "распределенная",
+    "specialized": "специализированная",
+    "nlp": "NLP",
+    "usb": "USB",
+    "bluetooth": "Bluetooth",
+    "raspberry-pi": "Raspberry Pi",
+    "camera": "камера",
+    "lightweight": "легковесная",
+    "orm": "ORM",
+    "nosql": "NoSQL",
+    "cache": "кэш",
+    "postgresql": "PostgreSQL",
+    "mysql": "MySQL",
+    "ml": "ML",
+    "deep-learning": "глубокое обучение",
+    "high-level": "высокоуровневая",
+    "gradient-boosting": "градиентный бустинг",
+    "2d": "2D",
+    "3d": "3D",
+    "opengl": "OpenGL",
+    "cross-platform": "кросс-платформенная",
+    "windows": "Windows",
+    "multi": "мульти"
+}
+class CompiledCatalog:
+    FORMAT = 2
+    def __init__(self, digest, data):
+        self.format = self.FORMAT
+        self.digest = digest
+        self.categories = []
+        self.by_key = {}
+        libraries = []
+        for category in data.get("categories", []):
+            category_libraries = []
+            for lib in category.get("libraries", []):
+                lib_info = dict(lib)
+                lib_info["category"] = category["name"]
+                lib_info["key"] = canonicalize_name(lib_info.get("install_name", ""))
+                if lib_info["key"]:
+                    self.by_key.setdefault(lib_info["key"], []).append(lib_info)
+                size = lib_info.get("size", "")
+                support = lib_info.get("support", "")
+                lib_info["display"] = (
+                    lib_info.get("name", ""),
+                    "★" * lib_info.get("activity", 0),
+                    "★" * lib_info.get("simplicity", 0),
+                    SIZE_TRANSLATION.get(size, size),
+                    SUPPORT_TRANSLATION.get(support, support)
+                )
+                category_libraries.append(lib_info)
+            self.categories.append({"name": category["name"], "libraries": category_libraries})
+            libraries.extend(category_libraries)
+        self.libraries = libraries
+        self.index = CatalogIndex(libraries)
+class CatalogCache:
+    def __init__(self, cache_directory=None, max_entries=CATALOG_CACHE_ENTRIES):
+        self.cache_directory = cache_directory or os.path.join(CACHE_DIR, "catalog")
+        self.max_entries = max_entries
+        self._loaded = {}
+        self._lock = threading.RLock()
+    def stat_key(self, path):
+        info = os.stat(path)
+        return (info.st_mtime_ns, info.st_size)
+    def cache_file(self, digest):
+        return os.path.join(self.cache_directory, f"{digest}.pickle")
+    def load(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            key = self.stat_key(path)
+            loaded = self._loaded.get(path)
+            if loaded is not None and loaded[0] == key:
+                return loaded[1]
+            with open(path, "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+            if loaded is not None and loaded[1].digest == digest:
+                catalog = loaded[1]
+            else:
+                catalog = self.read(digest)
+                if catalog is None:
+                    catalog = CompiledCatalog(digest, json.loads(raw.decode("utf-8")))
+                    self.write(catalog)
+            self._loaded[path] = (key, catalog)
+            return catalog
+    def read(self, digest):
+        try:
+            with open(self.cache_file(digest), "rb") as f:
+                catalog = pickle.load(f)
+        except Exception:
+            return None
+        if getattr(catalog, "format", None) != CompiledCatalog.FORMAT or catalog.digest != digest:
+            return None
+        os.utime(self.cache_file(digest))
+        return catalog
+    def write(self, catalog):
+        try:
+            os.makedirs(self.cache_directory, exist_ok=True)
+            cache_file = self.cache_file(catalog.digest)
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, "wb") as f:
+                pickle.dump(catalog, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, cache_file)
+            self.prune()
+        except Exception as e:
+            print(f"Ошибка при сохранении кэша каталога: {e}")
+    def prune(self):
+        entries = []
+        for entry in os.scandir(self.cache_directory):
+            if entry.name.endswith(".pickle"):
+                entries.append((entry.stat().st_mtime, entry.path))
+        entries.sort(reverse=True)
+        for _, path in entries[self.max_entries:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+CATALOG_CACHE = CatalogCache()
+def catalog_install_state(catalog, installed, outdated=None):
+    outdated = outdated or {}
+    state = {}
+    for key in catalog.by_key:
+        entry = installed.get(key)
+        if entry is not None:
+            latest = outdated.get(key)
+            state[key] = (entry.version, latest.get("latest_version") if latest else None)
+    return state
+def operation_matches(operation, package_name=None, operation_type=None, prefix=False):
+    package = operation.get("package") or ""
+    if package_name:
+        if prefix and not package.lower().startswith(package_name.lower()):
+            return False
+        if not prefix and package != package_name:
+            return False
+    return not operation_type or operation.get("type") == operation_type
+class LogBlobStore:
+    def __init__(self, directory, max_age=HISTORY_LOG_MAX_AGE, max_bytes=HISTORY_LOG_MAX_BYTES):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], f"{digest}.gz")
+    def put(self, text):
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path)
+                return digest
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_file = f"{path}.{os.getpid()}.tmp"
+            with open(temp_file, "wb") as f:
+                f.write(gzip.compress(data))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, path)
+        return digest
+    def get(self, digest):
+        try:
+            with open(self.path(digest), "rb") as f:
+                return gzip.decompress(f.read()).decode("utf-8")
+        except (OSError, EOFError, ValueError):
+            return None
+    def evict(self):
+        with self._lock:
+            if not os.path.isdir(self.directory):
+                return 0
+            blobs = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        file_stat = os.stat(path)
+                    except OSError:
+                        continue
+                    blobs.append((file_stat.st_mtime, file_stat.st_size, path))
+            blobs.sort()
+            total = sum(size for _, size, _ in blobs)
+            cutoff = time.time() - self.max_age
+            removed = 0
+            for mtime, size, path in blobs:
+                if mtime >= cutoff and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            return removed
+def read_legacy_history(path):
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            document = json.load(f)
+        except ValueError:
+            return None
+    operations = document.get("operations") if isinstance(document, dict) else document
+    if not isinstance(operations, list):
+        return None
+    operations = [operation for operation in operations if isinstance(operation, dict)]
+    for operation in operations:
+        operation.setdefault("id", uuid.uuid4().hex)
+    return operations
+class JournalHistoryStore:
+    def __init__(self, journal_file):
+        self.journal_file = journal_file
+        self.version_file = f"{journal_file}.version"
+        self._recovered = False
+        self._operations = None
+        self._offsets = {}
+        self._lock = threading.RLock()
+    def recover(self):
+        with self._lock:
+            if self._recovered:
+                return
+            self._recovered = True
+            if not os.path.exists(self.journal_file):
+                return
+            valid_end = 0
+            corrupted = False
+            missing_newline = False
+            with open(self.journal_file, "rb") as f:
+                offset = 0
+                for line in f:
+                    offset += len(line)
+                    complete = line.endswith(b"\n")
+                    if line.strip():
+                        try:
+                            json.loads(line)
+                        except ValueError:
+                            corrupted = corrupted or complete
+                            continue
+                    valid_end = offset
+                    missing_newline = not complete
+            if corrupted:
+                operations = read_legacy_history(self.journal_file)
+                suffix = "legacy" if operations is not None else "corrupt"
+                backup_file = f"{self.journal_file}.{suffix}-{time.strftime('%Y%m%d%H%M%S')}"
+                shutil.copy2(self.journal_file, backup_file)
+                if operations is not None:
+                    print(f"Файл истории {self.journal_file} в старом формате, преобразуется в журнал "
+                          f"(исходный файл сохранен в {backup_file})")
+                    self.write_all(operations)
+                    self.set_format_version(0)
+                else:
+                    print(f"Журнал истории {self.journal_file} поврежден, выполняется восстановление "
+                          f"(исходный файл сохранен в {backup_file})")
+                    self.compact()
+            elif valid_end < os.path.getsize(self.journal_file) or missing_newline:
+                with open(self.journal_file, "r+b") as f:
+                    f.truncate(valid_end)
+                    if missing_newline:
+                        f.seek(valid_end)
+                        f.write(b"\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+    def iter_entries(self):
+        self.recover()
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, "rb") as f:
+            offset = 0
+            for line in f:
+                start = offset
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    operation = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(operation, dict):
+                    yield start, operation
+    def iter_operations(self):
+        for _, operation in self.iter_entries():
+            yield operation
+    def remember(self, offset, operation):
+        self._operations.append({key: value for key, value in operation.items() if key != "details"})
+        self._offsets[operation.get("id")] = offset
+    def append(self, operation):
+        with self._lock:
+            self.recover()
+            line = (json.dumps(operation, ensure_ascii=False) + "\n").encode("utf-8")
+            with open(self.journal_file, "ab") as f:
+                offset = f.tell()
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if self._operations is not None:
+                self.remember(offset, operation)
+    def operations(self):
+        with self._lock:
+            if self._operations is None:
+                self.recover()
+                self._operations = []
+                self._offsets = {}
+                for offset, operation in self.iter_entries():
+                    self.remember(offset, operation)
+            return self._operations
+    def query(self, package_name=None, operation_type=None, limit=None, offset=0, prefix=False, details=True):
+        operations = [op for op in self.operations() if operation_matches(op, package_name, operation_type, prefix)]
+        operations.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
+        operations = operations[offset:offset + limit] if limit else operations[offset:]
+        if details:
+            return [self.get(op.get("id")) or dict(op) for op in operations]
+        return [dict(op) for op in operations]
+    def count(self, package_name=None, operation_type=None, prefix=False):
+        return sum(1 for op in self.operations() if operation_matches(op, package_name, operation_type, prefix))
+    def get(self, operation_id):
+        with self._lock:
+            self.operations()
+            offset = self._offsets.get(operation_id)
+            if offset is None:
+                return None
+            with open(self.journal_file, "rb") as f:
+                f.seek(offset)
+                line = f.readline()
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+    def write_all(self, operations):
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.journal_file))
+            temp_file = f"{self.journal_file}.{os.getpid()}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                for operation in operations:
+                    f.write(json.dumps(operation, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.journal_file)
+            try:
+                directory_fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(directory_fd)
+                finally:
+                    os.close(directory_fd)
+            except (OSError, AttributeError):
+                pass
+    def format_version(self):
+        try:
+            with open(self.version_file, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+    def set_format_version(self, version):
+        if version:
+            with open(self.version_file, "w", encoding="utf-8") as f:
+                f.write(f"{version}\n")
+        elif os.path.exists(self.version_file):
+            os.remove(self.version_file)
+    def compact(self, transform=None):
+        with self._lock:
+            self.recover()
+            operations = self.iter_operations()
+            self.write_all([transform(op) for op in operations] if transform else list(operations))
+            self._operations = None
+            self._offsets = {}
+class SqliteHistoryStore:
+    SUMMARY_COLUMNS = ("id", "timestamp", "date", "type", "package", "version", "success", "details_blob")
+    COLUMNS = SUMMARY_COLUMNS + ("details",)
+    def __init__(self, database_file):
+        self.database_file = database_file
+        self._lock = threading.RLock()
+        self.connection = sqlite3.connect(database_file, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS operations ("
+                "id TEXT PRIMARY KEY, timestamp TEXT NOT NULL, date TEXT, type TEXT, "
+                "package TEXT, package_key TEXT, version TEXT, success INTEGER, details TEXT, details_blob TEXT)"
+            )
+            columns = {row["name"] for row in self.connection.execute("PRAGMA table_info(operations)")}
+            if "details_blob" not in columns:
+                self.connection.execute("ALTER TABLE operations ADD COLUMN details_blob TEXT")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS operations_timestamp ON operations (timestamp)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS operations_package ON operations (package_key, timestamp)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS operations_type ON operations (type, timestamp)")
+    def is_empty(self):
+        with self._lock:
+            return self.connection.execute("SELECT 1 FROM operations LIMIT 1").fetchone() is None
+    def row_values(self, operation):
+        return (
+            operation.get("id") or uuid.uuid4().hex,
+            operation.get("timestamp", ""),
+            operation.get("date", ""),
+            operation.get("type", ""),
+            operation.get("package", ""),
+            (operation.get("package") or "").lower(),
+            operation.get("version"),
+            1 if operation.get("success") else 0,
+            operation.get("details", ""),
+            operation.get("details_blob")
+        )
+    def append(self, operation):
+        self.append_many([operation])
+    def append_many(self, operations):
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO operations "
+                "(id, timestamp, date, type, package, package_key, version, success, details, details_blob) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self.row_values(operation) for operation in operations]
+            )
+    def where_clause(self, package_name=None, operation_type=None, prefix=False):
+        conditions = []
+        parameters = []
+        if package_name:
+            if prefix:
+                key = package_name.lower()
+                conditions.append("package_key >= ? AND package_key < ?")
+                parameters.extend([key, key + "\uffff"])
+            else:
+                conditions.append("package = ?")
+                parameters.append(package_name)
+        if operation_type:
+            conditions.append("type = ?")
+            parameters.append(operation_type)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", parameters
+    def row_to_operation(self, row):
+        operation = {column: row[column] for column in row.keys()}
+        operation["success"] = bool(operation["success"])
+        if not operation.get("details_blob"):
+            operation.pop("details_blob", None)
+        return operation
+    def query(self, package_name=None, operation_type=None, limit=None, offset=0, prefix=False, details=True):
+        where, parameters = self.where_clause(package_name, operation_type, prefix)
+        columns = self.COLUMNS if details else self.SUMMARY_COLUMNS
+        sql = f"SELECT {', '.join(columns)} FROM operations{where} ORDER BY timestamp DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self.connection.execute(sql, parameters + [limit or -1, offset]).fetchall()
+        return [self.row_to_operation(row) for row in rows]
+    def count(self, package_name=None, operation_type=None, prefix=False):
+        where, parameters = self.where_clause(package_name, operation_type, prefix)
+        with self._lock:
+            return self.connection.execute(f"SELECT COUNT(*) FROM operations{where}", parameters).fetchone()[0]
+    def get(self, operation_id):
+        with self._lock:
+            row = self.connection.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM operations WHERE id = ?", (operation_id,)).fetchone()
+        return self.row_to_operation(row) if row else None
+    def format_version(self):
+        with self._lock:
+            return self.connection.execute("PRAGMA user_version").fetchone()[0]
+    def set_format_version(self, version):
+        with self._lock, self.connection:
+            self.connection.execute(f"PRAGMA user_version = {int(version)}")
+    def compact(self, transform=None):
+        with self._lock:
+            if transform:
+                rows = self.connection.execute(
+                    f"SELECT {', '.join(self.COLUMNS)} FROM operations WHERE length(details) > ?",
+                    (HISTORY_INLINE_DETAILS,)).fetchall()
+                self.append_many([transform(self.row_to_operation(row)) for row in rows])
+            self.connection.execute("VACUUM")
+class PackageHistoryManager:
+    def __init__(self, history_file=None, legacy_file="package_history.json",
+                 backend=HISTORY_BACKEND, journal_file="package_history.jsonl", log_directory=None):
+        if history_file and backend != "sqlite" and history_file.lower().endswith(".json"):
+            legacy_file, history_file = history_file, None
+        self.backend = backend
+        self.legacy_file = legacy_file
+        self.journal_file = journal_file
+        if backend == "sqlite":
+            self.history_file = history_file or "package_history.db"
+            self.store = SqliteHistoryStore(self.history_file)
+        else:
+            self.history_file = history_file or journal_file
+            self.store = JournalHistoryStore(self.history_file)
+        self.log_store = LogBlobStore(log_directory or os.path.join(
+            os.path.dirname(os.path.abspath(self.history_file)), "package_history_logs"))
+        self._migrate_legacy_history()
+        try:
+            if self.store.format_version() < HISTORY_FORMAT_VERSION:
+                self.compact()
+                self.store.set_format_version(HISTORY_FORMAT_VERSION)
+            else:
+                self.log_store.evict()
+        except Exception as e:
+            print(f"Ошибка при очистке журналов операций: {e}")
+    def _read_legacy_history(self):
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return []
+        operations = read_legacy_history(self.legacy_file)
+        if operations is None:
+            raise ValueError(f"{self.legacy_file}: не удалось прочитать историю операций")
+        return [self.externalize_details(operation) for operation in operations]
+    def externalize_details(self, operation):
+        details = operation.get("details") or ""
+        if len(details) <= HISTORY_INLINE_DETAILS:
+            return operation
+        operation = dict(operation, details="")
+        operation["details_blob"] = self.log_store.put(details)
+        return operation
+    def _migrate_legacy_history(self):
+        try:
+            if isinstance(self.store, SqliteHistoryStore):
+                if not self.store.is_empty():
+                    return
+                if os.path.exists(self.journal_file):
+                    operations = [self.externalize_details(operation) for operation in
+                                  JournalHistoryStore(self.journal_file).iter_operations()]
+                else:
+                    operations = self._read_legacy_history()
+                if operations:
+                    self.store.append_many(operations)
+            elif not os.path.exists(self.history_file):
+                operations = self._read_legacy_history()
+                if operations:
+                    self.store.write_all(operations)
+        except Exception as e:
+            print(f"Ошибка при переносе истории: {e}")
+    def add_operation(self, operation_type, package_name, version=None, success=True, details=None):
+        timestamp = datetime.datetime.now().isoformat()
+        operation = {
+            "id": uuid.uuid4().hex,
+            "timestamp": timestamp,
+            "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "type": operation_type,
+            "package": package_name,
+            "version": version,
+            "success": success,
+            "details": details or ""
+        }
+        try:
+            operation = self.externalize_details(operation)
+            self.store.append(operation)
+        except Exception as e:
+            print(f"Ошибка при сохранении истории: {e}")
+        return operation
+    def compact(self):
+        self.store.compact(self.externalize_details)
+        self.log_store.evict()
+    def get_operations(self, package_name=None, operation_type=None, limit=None, offset=0, prefix=False, details=True):
+        if not (limit and isinstance(limit, int) and limit > 0):
+            limit = None
+        try:
+            return self.store.query(package_name, operation_type, limit, offset, prefix, details)
+        except Exception as e:
+            print(f"Ошибка при загрузке истории: {e}")
+            return []
+    def count_operations(self, package_name=None, operation_type=None, prefix=False):
+        try:
+            return self.store.count(package_name, operation_type, prefix)
+        except Exception as e:
+            print(f"Ошибка при загрузке истории: {e}")
+            return 0
+    def get_operation(self, operation_id):
+        return self.store.get(operation_id)
+    def get_operation_details(self, operation):
+        if operation.get("details_blob"):
+            details = self.log_store.get(operation["details_blob"])
+            return "Журнал операции удален по сроку хранения" if details is None else details
+        if "details" in operation:
+            return operation.get("details") or ""
+        try:
+            full_operation = self.store.get(operation.get("id"))
+        except Exception as e:
+            print(f"Ошибка при загрузке истории: {e}")
+            return ""
+        if not full_operation:
+            return ""
+        return self.get_operation_details(full_operation)
+    def can_rollback(self, operation):
+        if not operation or not isinstance(operation, dict):
+            return False
+        op_type = operation.get("type")
+        success = operation.get("success", False)
+        if not success:
+            return False
+        if op_type == "install":
+            return True
+        elif op_type == "uninstall":
+            return operation.get("version") is not None
+        elif op_type == "update":
+            return operation.get("version") is not None
+        return False
+    def rollback_operation(self, operation, on_output=None, cancel_event=None):
+        if not self.can_rollback(operation):
+            return False, "Невозможно откатить эту операцию"
+        op_type = operation.get("type")
+        package = operation.get("package")
+        version = operation.get("version")
+        cmd = pip_command()
+        if op_type == "install":
+            cmd.extend(["uninstall", "-y", package])
+            rollback_type = "uninstall_rollback"
+        elif op_type == "uninstall":
+            cmd.extend(["install", f"{package}=={version}"])
+            rollback_type = "install_rollback"
+        elif op_type == "update":
+            cmd.extend(["install", f"{package}=={version}"])
+            rollback_type = "downgrade_rollback"
+        try:
+            result = run_command(cmd, on_output, cancel_event, PIP_TIMEOUT)
+            success = result.success
+            details = result.stdout if success else result.error
+            self.add_operation(
+                rollback_type,
+                package,
+                version,
+                success,
+                f"Откат операции от {operation.get('date')}: {details}"
+            )
+            return success, "Откат выполнен успешно" if success else f"Ошибка отката: {result.error}"
+        except Exception as e:
+            return False, f"Ошибка при откате: {str(e)}"